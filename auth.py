@@ -1,60 +1,162 @@
 import streamlit as st
-from sqlalchemy import create_engine, Column, Integer, String
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
 from passlib.hash import bcrypt
-import os
 import jwt
 import datetime
 import logging
-from dotenv import load_dotenv
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from config import env
+from database import fetch_query
+from cache import TTLCache, MISSING
+from throttle import RateLimiter
 
-load_dotenv()
-
-# Database setup
-engine = create_engine(os.getenv('DATABASE_URL'))
-Session = sessionmaker(bind=engine)
-Base = declarative_base()
+# Comma-separated usernames allowed to open the diagnostics page
+ADMIN_USERNAMES = {name.strip().lower() for name in env('ADMIN_USERNAMES', '').split(',') if name.strip()}
 
 # JWT configuration
-JWT_SECRET = os.getenv('JWT_SECRET')
+JWT_SECRET = env('JWT_SECRET')
 JWT_ALGORITHM = 'HS256'
-JWT_EXPIRATION_DELTA = datetime.timedelta(minutes=5)
+JWT_EXPIRATION_DELTA = datetime.timedelta(minutes=env('JWT_EXPIRATION_MINUTES', 5.0, float))
+# A token is only re-issued once less than this much of its lifetime is left. Half the lifetime
+# keeps the idle timeout between half and all of JWT_EXPIRATION_MINUTES.
+JWT_REFRESH_THRESHOLD = datetime.timedelta(
+    seconds=env('JWT_REFRESH_THRESHOLD_SECONDS', JWT_EXPIRATION_DELTA.total_seconds() / 2, float))
+JWT_CLAIMS_CACHE_SIZE = env('JWT_CLAIMS_CACHE_SIZE', 1024, int)
+
+# Verified claims by token, so reruns skip signature verification
+claims_cache = TTLCache(maxsize=JWT_CLAIMS_CACHE_SIZE, ttl=JWT_EXPIRATION_DELTA.total_seconds())
+
+# bcrypt runs on a small dedicated pool so a burst of logins cannot take every core
+PASSWORD_HASH_WORKERS = env('PASSWORD_HASH_WORKERS', 2, int)
+PASSWORD_HASH_MAX_PENDING = env('PASSWORD_HASH_MAX_PENDING', 16, int)
+PASSWORD_HASH_TIMEOUT = env('PASSWORD_HASH_TIMEOUT', 10.0, float)
+
+# Token buckets: burst size plus sustained attempts per minute
+LOGIN_USERNAME_BURST = env('LOGIN_USERNAME_BURST', 5, int)
+LOGIN_USERNAME_PER_MINUTE = env('LOGIN_USERNAME_PER_MINUTE', 2.0, float)
+LOGIN_IP_BURST = env('LOGIN_IP_BURST', 20, int)
+LOGIN_IP_PER_MINUTE = env('LOGIN_IP_PER_MINUTE', 10.0, float)
+# Reverse proxies in front of the app that append to X-Forwarded-For; 0 trusts no forwarding headers
+TRUSTED_PROXY_HOPS = env('TRUSTED_PROXY_HOPS', 1, int)
+# Only for proxies that set X-Real-Ip themselves and overwrite any value the client sent
+TRUST_X_REAL_IP = env('TRUST_X_REAL_IP', False, bool)
 
-class User(Base):
-    __tablename__ = 'users'
-    id = Column(Integer, primary_key=True)
-    username = Column(String, unique=True, nullable=False)
-    password_hash = Column(String, nullable=False)
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+_password_lock = threading.Lock()
+_password_pending = 0
+_password_rejected = 0
 
-Base.metadata.create_all(engine)
+username_limiter = RateLimiter(LOGIN_USERNAME_BURST, LOGIN_USERNAME_PER_MINUTE / 60)
+ip_limiter = RateLimiter(LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60)
+
+class AuthThrottled(Exception):
+    pass
+
+def _release_password_slot(future):
+    global _password_pending
+    with _password_lock:
+        _password_pending -= 1
+
+def _run_password_work(function, *args):
+    global _password_pending, _password_rejected
+    with _password_lock:
+        if _password_pending >= PASSWORD_HASH_MAX_PENDING:
+            _password_rejected += 1
+            raise AuthThrottled("The server is busy processing sign-ins. Please try again shortly.")
+        _password_pending += 1
+    try:
+        future = _password_executor.submit(function, *args)
+    except Exception:
+        _release_password_slot(None)
+        raise
+    # The slot is freed when the work finishes, even if this caller stops waiting
+    future.add_done_callback(_release_password_slot)
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        logging.warning(f"Password hashing did not finish within {PASSWORD_HASH_TIMEOUT:.0f}s")
+        raise AuthThrottled("The server is busy processing sign-ins. Please try again shortly.")
 
 def hash_password(password):
-    return bcrypt.hash(password)
+    return _run_password_work(bcrypt.hash, password)
 
 def verify_password(plain_password, hashed_password):
-    return bcrypt.verify(plain_password, hashed_password)
+    return _run_password_work(bcrypt.verify, plain_password, hashed_password)
+
+def get_client_ip():
+    # Clients can send any X-Forwarded-For; only the entries appended by our own proxies are
+    # trusted. The last TRUSTED_PROXY_HOPS entries come from them, and the leftmost of those
+    # is the address the outermost proxy saw.
+    if TRUSTED_PROXY_HOPS <= 0:
+        return None
+    try:
+        headers = st.context.headers
+    except AttributeError:
+        return None
+    forwarded_for = headers.get('X-Forwarded-For')
+    if forwarded_for:
+        entries = [entry.strip() for entry in forwarded_for.split(',') if entry.strip()]
+        if len(entries) >= TRUSTED_PROXY_HOPS:
+            return entries[-TRUSTED_PROXY_HOPS]
+        logging.warning(f"X-Forwarded-For has fewer entries than TRUSTED_PROXY_HOPS={TRUSTED_PROXY_HOPS}")
+        return None
+    if TRUST_X_REAL_IP:
+        return headers.get('X-Real-Ip')
+    return None
+
+def check_attempt_allowed(username=None, client_ip=None):
+    if client_ip and not ip_limiter.allow(client_ip):
+        logging.warning(f"Throttled authentication attempt from {client_ip}")
+        raise AuthThrottled("Too many attempts. Please wait a minute and try again.")
+    if username and not username_limiter.allow(username):
+        logging.warning(f"Throttled authentication attempt for {username}")
+        raise AuthThrottled("Too many attempts. Please wait a minute and try again.")
 
-def register_user(username, password):
+def get_auth_metrics():
+    with _password_lock:
+        pending = _password_pending
+        rejected = _password_rejected
+    return {
+        'password_workers': PASSWORD_HASH_WORKERS,
+        'password_pending': pending,
+        'password_queue_depth': max(0, pending - PASSWORD_HASH_WORKERS),
+        'password_queue_rejected': rejected,
+        'username_throttle': username_limiter.stats(),
+        'ip_throttle': ip_limiter.stats(),
+    }
+
+def get_user(username):
+    rows = fetch_query("SELECT id, password_hash FROM users WHERE username = %s", (username,))
+    return rows[0] if rows else None
+
+def register_user(username, password, client_ip=None):
     username = username.lower()  # Convert username to lowercase
-    session = Session()
-    if session.query(User).filter_by(username=username).first():
+    check_attempt_allowed(client_ip=client_ip)
+    # Checked first so a taken name does not cost a bcrypt hash
+    if get_user(username):
         return False
-    new_user = User(username=username, password_hash=hash_password(password))
-    session.add(new_user)
-    session.commit()
-    session.close()
-    return True
+    rows = fetch_query(
+        "INSERT INTO users (username, password_hash) VALUES (%s, %s) "
+        "ON CONFLICT (username) DO NOTHING RETURNING id",
+        (username, hash_password(password)), idempotent=False)
+    return bool(rows)
 
-def authenticate_user(username, password):
+def authenticate_user(username, password, client_ip=None):
     username = username.lower()  # Convert username to lowercase
-    session = Session()
-    user = session.query(User).filter_by(username=username).first()
-    session.close()
-    if user and verify_password(password, user.password_hash):
-        return user.id
+    check_attempt_allowed(username, client_ip)
+    user = get_user(username)
+    if user and verify_password(password, user['password_hash']):
+        return user['id']
     return None
 
+def is_admin():
+    user_id = st.session_state.get('user_id')
+    if not user_id or not ADMIN_USERNAMES:
+        return False
+    # Looked up by id: sessions restored from a token do not carry the username
+    rows = fetch_query("SELECT username FROM users WHERE id = %s", (user_id,))
+    return bool(rows) and rows[0]['username'] in ADMIN_USERNAMES
+
 def create_token(user_id):
     payload = {
         'user_id': user_id,
@@ -62,21 +164,39 @@ def create_token(user_id):
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-def decode_token(token):
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload['user_id']
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
+def verify_token(token):
+    now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+    payload = claims_cache.get(token)
+    if payload is MISSING:
+        try:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
+        claims_cache.set(token, payload)
+    if payload['exp'] <= now:
         return None
+    return payload
+
+def decode_token(token):
+    payload = verify_token(token)
+    return payload['user_id'] if payload else None
+
+def token_needs_refresh(payload):
+    remaining = payload['exp'] - datetime.datetime.now(datetime.timezone.utc).timestamp()
+    return remaining < JWT_REFRESH_THRESHOLD.total_seconds()
 
 def login():
     st.subheader("Login")
     username = st.text_input("Username", key="login_username")
     password = st.text_input("Password", type="password", key="login_password")
     if st.button("Login"):
-        user_id = authenticate_user(username, password)
+        try:
+            user_id = authenticate_user(username, password, get_client_ip())
+        except AuthThrottled as e:
+            st.error(str(e))
+            return False
         if user_id:
             token = create_token(user_id)
             st.session_state.token = token
@@ -98,9 +218,15 @@ def login():
     return False
 
 def logout():
+    token = st.session_state.get('token')
+    if token:
+        claims_cache.invalidate(lambda key: key == token)
     st.session_state.token = None
     st.session_state.user = None
     st.session_state.user_id = None
+    export = st.session_state.pop('expense_export', None)
+    if export is not None:
+        export.discard()
     
     # Clear token from sessionStorage
     st.write("""
@@ -116,7 +242,12 @@ def register():
     username = st.text_input("Username", key="register_username")
     password = st.text_input("Password", type="password", key="register_password")
     if st.button("Register"):
-        if register_user(username, password):
+        try:
+            registered = register_user(username, password, get_client_ip())
+        except AuthThrottled as e:
+            st.error(str(e))
+            return
+        if registered:
             st.success("Registration successful. You can now log in.")
         else:
             st.error("Username already exists. Please choose a different username.")
@@ -135,19 +266,20 @@ def is_authenticated():
         logging.info("No valid token found")
         return False
     
-    user_id = decode_token(st.session_state.token)
-    if user_id:
-        new_token = create_token(user_id)
-        st.session_state.token = new_token
-        
-        # Update token in sessionStorage
-        st.write(f"""
-        <script>
-        sessionStorage.setItem('jwt_token', '{new_token}');
-        </script>
-        """, unsafe_allow_html=True)
-        
-        logging.info("Token refreshed")
+    payload = verify_token(st.session_state.token)
+    if payload:
+        if token_needs_refresh(payload):
+            new_token = create_token(payload['user_id'])
+            st.session_state.token = new_token
+
+            # Update token in sessionStorage
+            st.write(f"""
+            <script>
+            sessionStorage.setItem('jwt_token', '{new_token}');
+            </script>
+            """, unsafe_allow_html=True)
+
+            logging.info("Token refreshed")
         return True
     logging.info("User not authenticated")
     return False
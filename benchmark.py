@@ -0,0 +1,276 @@
+import io
+import sys
+import time
+import random
+import platform
+import statistics
+import subprocess
+import uuid
+from datetime import date, datetime
+from database import transaction, ensure_schema
+from importers import CopyStream, copy_line
+import database
+
+BENCHMARK_USER_PREFIX = 'benchmark-'
+# Not a valid bcrypt hash: registration always stores one, so no real account can carry it
+# and benchmark users can never sign in
+BENCHMARK_PASSWORD_HASH = '!'
+DESCRIPTIONS = ['Groceries', 'Coffee', 'Taxi', 'Lunch', 'Electricity', 'Cinema', 'Books', 'Pharmacy', '']
+
+def _months_back(years):
+    today = date.today()
+    months = []
+    for year in range(today.year - years + 1, today.year + 1):
+        last_month = today.month if year == today.year else 12
+        months.extend((year, month) for month in range(1, last_month + 1))
+    return months
+
+def _synthetic_expense_lines(rng, user_id, category_ids, months, expenses_per_month, activity):
+    # Zipf-like category weights in a per-user order, log-normal amounts
+    order = list(category_ids)
+    rng.shuffle(order)
+    weights = [1 / (rank + 1) ** 1.2 for rank in range(len(order))]
+    for year, month in months:
+        count = max(0, int(expenses_per_month * activity * rng.uniform(0.6, 1.4)))
+        last_day = 28 if month == 2 else 30
+        for category_id in rng.choices(order, weights, k=count):
+            spent_at = datetime(year, month, rng.randint(1, last_day), rng.randint(7, 22), rng.randint(0, 59))
+            if spent_at > datetime.now():
+                continue
+            yield copy_line([user_id, category_id, round(rng.lognormvariate(3.0, 1.0), 2),
+                             rng.choice(DESCRIPTIONS), spent_at.isoformat(sep=' ')])
+
+def remove_synthetic_data(user_ids=None):
+    # Deletes the given seeded users, or every leftover one from runs with --keep-data. Either way
+    # only accounts carrying the seeder's password marker are touched, never real users whose
+    # name happens to start with the prefix.
+    with transaction() as cur:
+        if user_ids is None:
+            cur.execute("SELECT id FROM users WHERE username LIKE %s AND password_hash = %s",
+                        (BENCHMARK_USER_PREFIX + '%', BENCHMARK_PASSWORD_HASH))
+        else:
+            cur.execute("SELECT id FROM users WHERE id = ANY(%s) AND password_hash = %s",
+                        (list(user_ids), BENCHMARK_PASSWORD_HASH))
+        user_ids = [row[0] for row in cur.fetchall()]
+        if user_ids:
+            for table in ('expenses', 'monthly_category_totals', 'salary', 'categories'):
+                cur.execute(f"DELETE FROM {table} WHERE user_id = ANY(%s)", (user_ids,))
+            cur.execute("DELETE FROM users WHERE id = ANY(%s)", (user_ids,))
+    return len(user_ids)
+
+def seed_synthetic_data(users=5, years=3, expenses_per_month=60, custom_categories=4, seed=0):
+    # Returns {user_id: expense rows}; activity per user is Pareto-distributed so a few users dominate
+    rng = random.Random(seed)
+    months = _months_back(years)
+    remove_synthetic_data()
+    seeded = {}
+    run_id = uuid.uuid4().hex[:8]
+    with transaction() as cur:
+        cur.execute("SELECT id FROM categories WHERE user_id IS NULL")
+        default_ids = [row[0] for row in cur.fetchall()]
+        for index in range(users):
+            # The run id keeps seeded names from colliding with any existing account
+            cur.execute("INSERT INTO users (username, password_hash) VALUES (%s, %s) RETURNING id",
+                        (f"{BENCHMARK_USER_PREFIX}{run_id}-{index}", BENCHMARK_PASSWORD_HASH))
+            user_id = cur.fetchone()[0]
+            category_ids = list(default_ids)
+            for number in range(custom_categories):
+                cur.execute("INSERT INTO categories (user_id, name) VALUES (%s, %s) RETURNING id",
+                            (user_id, f"Custom {number + 1}"))
+                category_ids.append(cur.fetchone()[0])
+            for year, month in months:
+                cur.execute("INSERT INTO salary (user_id, amount, month, year) VALUES (%s, %s, %s, %s)",
+                            (user_id, rng.choice([2500, 4000, 6500]), month, year))
+            activity = min(10.0, rng.paretovariate(1.5))
+            lines = _synthetic_expense_lines(rng, user_id, category_ids, months, expenses_per_month, activity)
+            cur.copy_expert(
+                "COPY expenses (user_id, category_id, amount, description, date) FROM STDIN WITH (FORMAT csv)",
+                CopyStream(lines)
+            )
+            seeded[user_id] = cur.rowcount
+    return seeded
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'min_ms': ordered[0] * 1000,
+        'median_ms': statistics.median(ordered) * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'mean_ms': statistics.fmean(ordered) * 1000,
+    }
+
+def measure(function, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+def _reset_schema_check():
+    database._schema_version = None
+
+def _tracker_benchmarks(tracker, month, year, years):
+    all_months = list(range(1, 13))
+    page_df, next_cursor = tracker.get_expenses_page(month, year)
+    return {
+        'get_salary': lambda: tracker.get_salary(month, year),
+        'get_categories': lambda: tracker.get_categories(),
+        'get_expenses_month': lambda: tracker.get_expenses(month, year),
+        'get_expenses_all': lambda: tracker.get_expenses(),
+        'get_expenses_page_first': lambda: tracker.get_expenses_page(month, year),
+        'get_expenses_page_second': lambda: tracker.get_expenses_page(month, year, after=next_cursor),
+        'get_category_totals': lambda: tracker.get_category_totals(month, year),
+        'get_monthly_totals': lambda: tracker.get_monthly_totals(years, all_months),
+        'get_category_matrix': lambda: tracker.get_category_matrix(years, all_months),
+        'export_expenses_csv': lambda: tracker.export_expenses(io.BytesIO(), 'csv'),
+    }
+
+def _write_benchmarks(tracker, month, year, repeat, batch_size=50):
+    results = {}
+    salary = tracker.get_salary(month, year) or 0
+    results['update_salary'] = measure(lambda: tracker.update_salary(salary, month, year), repeat)
+    results['add_and_remove_category'] = measure(
+        lambda: (tracker.add_category('Benchmark category'), tracker.remove_category('Benchmark category')), repeat)
+
+    marker = 'benchmark batch'
+    expense_date = date(year, month, 1)
+    category = tracker.get_categories()[0]
+    batch = [{'category': category, 'amount': 9.99, 'description': marker, 'date': expense_date}
+             for _ in range(batch_size)]
+    add_samples, remove_samples = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        tracker.add_expenses(batch)
+        add_samples.append(time.perf_counter() - started)
+        with transaction() as cur:
+            cur.execute("SELECT id FROM expenses WHERE user_id = %s AND description = %s",
+                        (tracker.user_id, marker))
+            expense_ids = [row[0] for row in cur.fetchall()]
+        started = time.perf_counter()
+        tracker.remove_expenses(expense_ids)
+        remove_samples.append(time.perf_counter() - started)
+    results[f'add_expenses_{batch_size}'] = summarize(add_samples)
+    results[f'remove_expenses_{batch_size}'] = summarize(remove_samples)
+
+    csv_rows = ''.join(f"{expense_date:%Y-%m-%d},{category},{index % 90 + 1}.50,imported\n"
+                       for index in range(500))
+    statement = ('date,category,amount,description\n' + csv_rows).encode('utf-8')
+    results['import_expenses_500_dry_run'] = measure(
+        lambda: tracker.import_expenses(io.BytesIO(statement), dry_run=True), repeat)
+    return results
+
+def _chart_benchmarks(tracker, month, year, years, repeat):
+    import visualizations
+    totals_df = tracker.get_category_totals(month, year)
+    comparison_df = tracker.get_monthly_totals(years, list(range(1, 13)))
+    matrix_df = tracker.get_category_matrix(years, list(range(1, 13)))
+    charts = {
+        'create_expense_pie_chart': lambda: visualizations.create_expense_pie_chart(totals_df, '$', 'English'),
+        'create_expense_comparison_chart':
+            lambda: visualizations.create_expense_comparison_chart(comparison_df, '$', 'English'),
+        'create_category_comparison_chart':
+            lambda: visualizations.create_category_comparison_chart(matrix_df, '$', 'English'),
+    }
+    results = {}
+    for name, build in charts.items():
+        results[f'{name}_cold'] = measure(build, repeat, setup=visualizations.figure_cache.clear)
+        build()
+        results[f'{name}_warm'] = measure(build, repeat)
+    return results
+
+def _page_benchmarks(user_id, month, year, repeat, timeout):
+    # Full reruns of main.py through Streamlit's headless test harness, signed in as the user
+    from streamlit.testing.v1 import AppTest
+    from auth import create_token
+    from expense_tracker import query_cache
+
+    def render(page):
+        app = AppTest.from_file('main.py', default_timeout=timeout)
+        app.session_state['token'] = create_token(user_id)
+        app.session_state['user'] = f"{BENCHMARK_USER_PREFIX}user"
+        app.session_state['user_id'] = user_id
+        app.session_state['selected_month'] = month - 1
+        app.session_state['selected_year'] = year
+        app.session_state['current_page'] = page
+        app.run()
+        if app.exception:
+            raise RuntimeError(f"Rendering {page} failed: {app.exception[0].message}")
+
+    results = {}
+    for name, page in (('show_dashboard', 'home'), ('show_expense_comparison', 'compare_expenses')):
+        results[f'{name}_cold'] = measure(lambda: render(page), repeat, setup=query_cache.clear)
+        results[f'{name}_warm'] = measure(lambda: render(page), repeat)
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(users=5, years=3, expenses_per_month=60, custom_categories=4, seed=0,
+                   repeat=10, include_writes=True, include_pages=True, page_timeout=30, keep_data=False):
+    from expense_tracker import ExpenseTracker, query_cache
+
+    report = {
+        'commit': _git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'users': users, 'years': years, 'expenses_per_month': expenses_per_month,
+                   'custom_categories': custom_categories, 'seed': seed, 'repeat': repeat},
+        'results': {},
+    }
+    results = report['results']
+    results['initialize_database'] = measure(ensure_schema, repeat, setup=_reset_schema_check)
+
+    started = time.perf_counter()
+    seeded = seed_synthetic_data(users, years, expenses_per_month, custom_categories, seed)
+    report['seed'] = {'seconds': time.perf_counter() - started, 'expenses': sum(seeded.values())}
+    try:
+        # Benchmark against the heaviest user, which is what a regression would hurt most
+        user_id = max(seeded, key=seeded.get)
+        report['seed']['benchmark_user_expenses'] = seeded[user_id]
+        today = date.today()
+        month, year = today.month, today.year
+        year_range = list(range(year - years + 1, year + 1))
+        tracker = ExpenseTracker(user_id)
+
+        for name, call in _tracker_benchmarks(tracker, month, year, year_range).items():
+            results[f'{name}_cold'] = measure(call, repeat, setup=query_cache.clear)
+            call()
+            results[f'{name}_warm'] = measure(call, repeat)
+        if include_writes:
+            results.update(_write_benchmarks(tracker, month, year, repeat))
+        results.update(_chart_benchmarks(tracker, month, year, year_range, repeat))
+        if include_pages:
+            results.update(_page_benchmarks(user_id, month, year, repeat, page_timeout))
+    finally:
+        if not keep_data:
+            remove_synthetic_data(list(seeded))
+    report['finished_at'] = datetime.now().isoformat(timespec='seconds')
+    return report
+
+def compare_reports(baseline, current, metric='median_ms'):
+    # Rows of (benchmark, baseline, current, ratio); ratio > 1 means the current run is slower
+    rows = []
+    for name, stats in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None or not before.get(metric):
+            rows.append((name, None, stats[metric], None))
+            continue
+        rows.append((name, before[metric], stats[metric], stats[metric] / before[metric]))
+    return rows
+
+def print_comparison(rows, threshold=1.2, file=sys.stdout):
+    print(f"{'benchmark':<42} {'baseline':>10} {'current':>10} {'ratio':>7}", file=file)
+    for name, before, after, ratio in rows:
+        flag = '  slower' if ratio is not None and ratio > threshold else ''
+        before_text = f"{before:.2f}" if before is not None else '-'
+        ratio_text = f"{ratio:.2f}" if ratio is not None else '-'
+        print(f"{name:<42} {before_text:>10} {after:>10.2f} {ratio_text:>7}{flag}", file=file)
@@ -0,0 +1,13 @@
+import os
+from dotenv import load_dotenv
+
+# The one place .env is loaded; modules read their settings through env()
+load_dotenv()
+
+def env(name, default=None, cast=str):
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    if cast is bool:
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return cast(value)
@@ -0,0 +1,97 @@
+import os
+import csv
+import logging
+import threading
+from config import env
+
+BASE_CURRENCY = 'USD'
+FX_RATES_FILE = env('FX_RATES_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fx_rates.csv'))
+
+CURRENCY_SYMBOLS = {'USD': '$', 'EUR': '€', 'GBP': '£', 'TRY': '₺'}
+
+_rates = {BASE_CURRENCY: 1.0}
+_rates_version = None
+_rates_loaded = False  # True once a rates file has been parsed successfully
+_rates_lock = threading.Lock()
+
+class UnknownCurrency(ValueError):
+    pass
+
+def load_fx_rates(path=None):
+    # CSV with columns currency,per_usd: units of the currency that one US dollar buys
+    path = path or FX_RATES_FILE
+    rates = {}
+    with open(path, newline='') as rates_file:
+        for line_number, row in enumerate(csv.DictReader(rates_file), start=2):
+            code = (row.get('currency') or '').strip().upper()
+            try:
+                per_usd = float(row.get('per_usd') or '')
+            except ValueError:
+                raise ValueError(f"{path}:{line_number}: invalid rate '{row.get('per_usd')}'")
+            if len(code) != 3 or per_usd <= 0:
+                raise ValueError(f"{path}:{line_number}: invalid currency or rate")
+            rates[code] = per_usd
+    if rates.get(BASE_CURRENCY, 1.0) != 1.0:
+        raise ValueError(f"{path}: {BASE_CURRENCY} must have a rate of 1")
+    rates[BASE_CURRENCY] = 1.0
+    return rates
+
+def get_fx_rates():
+    # Reloaded when the file changes, so new rates apply without a restart. A broken or missing
+    # file keeps the last good table in service; it only raises if no table was ever loaded.
+    global _rates, _rates_version, _rates_loaded
+    try:
+        version = os.stat(FX_RATES_FILE).st_mtime_ns
+    except OSError:
+        version = None
+    if version != _rates_version:
+        with _rates_lock:
+            if version != _rates_version:
+                if version is None:
+                    if _rates_loaded:
+                        logging.error(f"FX rates file {FX_RATES_FILE} not found; keeping the previous rates")
+                    else:
+                        logging.warning(f"FX rates file {FX_RATES_FILE} not found; only {BASE_CURRENCY} is available")
+                        _rates = {BASE_CURRENCY: 1.0}
+                else:
+                    try:
+                        _rates = load_fx_rates(FX_RATES_FILE)
+                        _rates_loaded = True
+                    except (OSError, ValueError) as e:
+                        if not _rates_loaded:
+                            raise
+                        logging.error(f"Could not reload FX rates, keeping the previous rates: {e}")
+                _rates_version = version
+    return _rates
+
+def fx_rates_version():
+    get_fx_rates()
+    return _rates_version
+
+def available_currencies():
+    return sorted(get_fx_rates())
+
+def get_currency_symbol(currency):
+    return CURRENCY_SYMBOLS.get(currency, f"{currency} ")
+
+def _target_rate(rates, target):
+    if target not in rates:
+        raise UnknownCurrency(f"No FX rate for '{target}'")
+    return rates[target]
+
+def convert_amount(amount, currency, target):
+    rates = get_fx_rates()
+    target_rate = _target_rate(rates, target)
+    if currency == target:
+        return float(amount)
+    return float(amount) / _target_rate(rates, currency) * target_rate
+
+def convert_amounts(amounts, currencies, target):
+    # Vectorized over pandas Series: one map of currency codes to rates, then a single multiply
+    rates = get_fx_rates()
+    target_rate = _target_rate(rates, target)
+    per_usd = currencies.astype(str).map(rates)
+    missing = per_usd.isna()
+    if missing.any():
+        raise UnknownCurrency(f"No FX rate for {', '.join(sorted(set(currencies[missing].astype(str))))}")
+    return amounts.astype(float) / per_usd * target_rate
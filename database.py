@@ -1,99 +1,783 @@
-import os
+import math
+import time
+import random
 import logging
+import threading
+import uuid
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import DictCursor
-from dotenv import load_dotenv
+from psycopg2.pool import PoolError
+from config import env
+from querystats import QueryStats
+from throttle import CircuitBreaker
 
-load_dotenv()
+DATABASE_URL = env('DATABASE_URL')
+POOL_MIN_SIZE = env('DB_POOL_MIN_SIZE', 1, int)
+POOL_MAX_SIZE = env('DB_POOL_MAX_SIZE', 10, int)
+POOL_IDLE_TIMEOUT = env('DB_POOL_IDLE_TIMEOUT', 300.0, float)
+POOL_CHECKOUT_TIMEOUT = env('DB_POOL_CHECKOUT_TIMEOUT', 30.0, float)
+CONNECT_TIMEOUT = env('DB_CONNECT_TIMEOUT', 5.0, float)
+STREAM_BATCH_SIZE = env('DB_STREAM_BATCH_SIZE', 2000, int)
+# Connections idle for longer than this are pinged before being handed out
+POOL_HEALTH_CHECK_AFTER = env('DB_POOL_HEALTH_CHECK_AFTER', 30.0, float)
+# Off by default: migrations lock large tables, so they run as a deploy step through
+# 'python manage.py migrate'. The app only checks the version and logs when it is behind.
+AUTO_MIGRATE = env('DB_AUTO_MIGRATE', False, bool)
 
-def get_postgres_connection():
-    return psycopg2.connect(os.getenv('DATABASE_URL'))
+# Transient errors are retried with jittered exponential backoff on a fresh connection,
+# as long as the next attempt would start before the operation's deadline. Checkout and
+# connect are given what is left of the deadline, so one attempt cannot outlast it.
+RETRY_MAX_ATTEMPTS = env('DB_RETRY_MAX_ATTEMPTS', 3, int)
+RETRY_BASE_DELAY = env('DB_RETRY_BASE_DELAY', 0.1, float)
+RETRY_MAX_DELAY = env('DB_RETRY_MAX_DELAY', 2.0, float)
+OPERATION_DEADLINE = env('DB_OPERATION_DEADLINE', 10.0, float)
+# After this many consecutive connection failures, calls fail fast for BREAKER_RESET_TIMEOUT seconds
+BREAKER_FAILURE_THRESHOLD = env('DB_BREAKER_FAILURE_THRESHOLD', 5, int)
+BREAKER_RESET_TIMEOUT = env('DB_BREAKER_RESET_TIMEOUT', 10.0, float)
 
-def execute_db_operation(operation, params=None, fetch=False, max_retries=3):
-    conn = get_postgres_connection()
+# SQLSTATE classes and codes worth retrying: connection exceptions, insufficient resources,
+# operator intervention (shutdown, cannot connect now), serialization failures and deadlocks
+TRANSIENT_SQLSTATE_CLASSES = ('08', '53', '57P')
+TRANSIENT_SQLSTATES = {'40001', '40P01', '55P03'}
+
+SLOW_QUERY_MS = env('DB_SLOW_QUERY_MS', 500.0, float)
+QUERY_STATS_MAX_STATEMENTS = env('DB_QUERY_STATS_MAX_STATEMENTS', 500, int)
+
+query_stats = QueryStats(slow_query_ms=SLOW_QUERY_MS, max_statements=QUERY_STATS_MAX_STATEMENTS)
+
+class TimedCursorMixin:
+    # Every statement run through the pool is timed, including execute_values batches and COPY
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        error = False
+        try:
+            return super().execute(query, vars)
+        except psycopg2.Error:
+            error = True
+            raise
+        finally:
+            query_stats.record(query, time.perf_counter() - started, self.rowcount, error)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        error = False
+        try:
+            return super().copy_expert(sql, file, size)
+        except psycopg2.Error:
+            error = True
+            raise
+        finally:
+            query_stats.record(sql, time.perf_counter() - started, self.rowcount, error)
+
+class TimedCursor(TimedCursorMixin, extensions.cursor):
+    pass
+
+class TimedDictCursor(TimedCursorMixin, DictCursor):
+    pass
+
+def get_postgres_connection(connect_timeout=CONNECT_TIMEOUT):
+    # libpq takes whole seconds
+    conn = psycopg2.connect(DATABASE_URL, connect_timeout=max(1, math.ceil(connect_timeout)))
+    conn.cursor_factory = TimedCursor
+    return conn
+
+def get_query_stats():
+    return query_stats.stats()
+
+circuit_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+
+class DatabaseUnavailable(psycopg2.OperationalError):
+    pass
+
+def get_circuit_breaker_stats():
+    return circuit_breaker.stats()
+
+def is_transient_error(error):
+    if isinstance(error, PoolError):
+        return False
+    code = getattr(error, 'pgcode', None)
+    if code:
+        return code in TRANSIENT_SQLSTATES or code.startswith(TRANSIENT_SQLSTATE_CLASSES)
+    # No SQLSTATE: the server never answered (dropped socket, refused connection)
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+def is_connection_error(error):
+    code = getattr(error, 'pgcode', None)
+    if code:
+        return code.startswith(('08', '57P'))
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError)) and not isinstance(error, PoolError)
+
+def backoff_delay(attempt):
+    # Full jitter keeps workers that failed together from retrying together
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+class ConnectionPool:
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT, checkout_timeout=POOL_CHECKOUT_TIMEOUT,
+                 health_check_after=POOL_HEALTH_CHECK_AFTER, connect=get_postgres_connection):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self._connect = connect
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._in_use = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'total_wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'connections_reaped': 0,
+        }
+        for _ in range(min_size):
+            self._idle.append((self._new_connection(), time.monotonic()))
+        self._reaper_stop = threading.Event()
+        if idle_timeout > 0:
+            self._reaper = threading.Thread(target=self._reap_loop, name='db-pool-reaper', daemon=True)
+            self._reaper.start()
+
+    def _new_connection(self, connect_timeout=CONNECT_TIMEOUT):
+        conn = self._connect(connect_timeout=connect_timeout)
+        with self._cond:
+            self._stats['connections_created'] += 1
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if conn.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - last_used < self.health_check_after:
+            return True
+        try:
+            # Plain cursor so health pings stay out of the query statistics
+            with conn.cursor(cursor_factory=extensions.cursor) as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, timeout=None):
+        checkout_timeout = self.checkout_timeout if timeout is None else min(self.checkout_timeout, timeout)
+        start = time.monotonic()
+        deadline = start + checkout_timeout
+        waited = False
+        conn = None
+        last_used = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._in_use + len(self._idle) < self.max_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolError(f"connection pool exhausted after waiting {checkout_timeout:.1f}s")
+                waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+            wait_time = time.monotonic() - start
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['total_wait_time'] += wait_time
+                self._stats['max_wait_time'] = max(self._stats['max_wait_time'], wait_time)
+
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                logging.warning("Discarding unhealthy pooled database connection")
+                self._close_quietly(conn)
+                with self._cond:
+                    self._stats['connections_discarded'] += 1
+                conn = None
+            if conn is None:
+                conn = self._new_connection(min(CONNECT_TIMEOUT, max(0.0, deadline - time.monotonic())))
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+        to_close = []
+        with self._cond:
+            self._in_use -= 1
+            if discard or conn.closed or self._closed:
+                to_close.append(conn)
+                self._stats['connections_discarded'] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        for stale in to_close:
+            self._close_quietly(stale)
+
+    def discard_idle(self):
+        # After a failover every idle connection points at the old server
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._stats['connections_discarded'] += len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+        return len(idle)
+
+    def reap(self):
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            # Oldest connections sit at the front of the idle list
+            while (self._idle and self._in_use + len(self._idle) > self.min_size
+                   and now - self._idle[0][1] >= self.idle_timeout):
+                expired.append(self._idle.pop(0)[0])
+            self._stats['connections_reaped'] += len(expired)
+        for conn in expired:
+            self._close_quietly(conn)
+        return len(expired)
+
+    def _reap_loop(self):
+        interval = max(self.idle_timeout / 2, 1.0)
+        while not self._reaper_stop.wait(interval):
+            try:
+                self.reap()
+            except Exception as e:
+                logging.error(f"Connection pool reaper failed: {e}")
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['in_use'] = self._in_use
+            stats['idle'] = len(self._idle)
+            stats['size'] = self._in_use + len(self._idle)
+        stats['min_size'] = self.min_size
+        stats['max_size'] = self.max_size
+        stats['avg_wait_time'] = stats['total_wait_time'] / stats['waits'] if stats['waits'] else 0.0
+        return stats
+
+    def close(self):
+        self._reaper_stop.set()
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+def get_pool_stats():
+    return get_pool().stats()
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+@contextmanager
+def pooled_connection(timeout=None):
+    # The schema is checked on the first connection a process makes, not at import
+    if _schema_version is None and not getattr(_schema_work, 'active', False):
+        ensure_schema()
+    if not circuit_breaker.allow():
+        raise DatabaseUnavailable(
+            f"Database unavailable; not retrying for {circuit_breaker.retry_after():.1f}s")
+    started = time.perf_counter()
     try:
+        pool = get_pool()
+        conn = pool.getconn(timeout)
+    except psycopg2.Error as e:
+        _record_outcome(e)
+        raise
+    query_stats.record_acquire(time.perf_counter() - started)
+    discard = False
+    error = None
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        discard = True
+        error = e
+        raise
+    finally:
+        pool.putconn(conn, discard=discard)
+        _record_outcome(error)
+
+def _record_outcome(error):
+    # Only failures to reach the server count against the breaker; a rejected
+    # statement still proves the database is up
+    if error is not None and is_connection_error(error):
+        circuit_breaker.record_failure()
+        if _pool is not None:
+            _pool.discard_idle()
+    else:
+        circuit_breaker.record_success()
+
+@contextmanager
+def transaction(cursor_factory=TimedDictCursor):
+    # Unit of work: every statement on the yielded cursor runs on one pooled
+    # connection and is committed together, or rolled back if the block raises
+    with pooled_connection() as conn:
         with conn:
-            with conn.cursor(cursor_factory=DictCursor) as cur:
-                for attempt in range(max_retries):
-                    try:
+            with conn.cursor(cursor_factory=cursor_factory) as cur:
+                yield cur
+
+def execute_db_operation(operation, params=None, fetch=False, max_retries=RETRY_MAX_ATTEMPTS,
+                         cursor_factory=TimedDictCursor, deadline=OPERATION_DEADLINE, idempotent=True):
+    # Each attempt runs in its own transaction on a freshly checked-out connection.
+    # Writes that must not run twice pass idempotent=False: once the statement may have
+    # reached the server, they are only retried on an error the server reported, which
+    # means the transaction was rolled back. A lost connection could hide a commit.
+    expires_at = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        attempt += 1
+        sent = False
+        try:
+            with pooled_connection(timeout=max(0.0, expires_at - time.monotonic())) as conn:
+                sent = True
+                with conn:
+                    with conn.cursor(cursor_factory=cursor_factory) as cur:
                         if callable(operation):
                             result = operation(cur)
                         else:
                             cur.execute(operation, params or ())
-                            if fetch:
-                                result = cur.fetchall()
-                        conn.commit()
-                        if fetch:
-                            return result
-                        return
-                    except psycopg2.Error as e:
-                        conn.rollback()
-                        logging.error(f"Database error (attempt {attempt + 1}/{max_retries}): {e}")
-                        if attempt == max_retries - 1:
-                            raise e
-    finally:
-        conn.close()
+                            result = cur.fetchall() if fetch else None
+            return result if fetch else None
+        except DatabaseUnavailable:
+            raise
+        except psycopg2.Error as e:
+            transient = is_transient_error(e)
+            if transient and sent and not idempotent and not getattr(e, 'pgcode', None):
+                logging.error(f"Database error after a non-idempotent statement was sent; not retrying: {e}")
+                raise
+            logging.error(f"Database error (attempt {attempt}/{max_retries}, "
+                          f"{'transient' if transient else 'permanent'}): {e}")
+            if not transient or attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            if time.monotonic() + delay >= expires_at:
+                logging.error(f"Giving up after {attempt} attempt(s): deadline of {deadline:.1f}s reached")
+                raise
+            query_stats.record_retry(operation)
+            time.sleep(delay)
 
-def execute_query(query, params=None):
-    execute_db_operation(query, params)
+def execute_query(query, params=None, idempotent=True):
+    execute_db_operation(query, params, idempotent=idempotent)
 
-def fetch_query(query, params=None):
-    return execute_db_operation(query, params, fetch=True)
+def fetch_query(query, params=None, idempotent=True):
+    return execute_db_operation(query, params, fetch=True, idempotent=idempotent)
 
-def initialize_database():
-    operations = [
-        '''
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL
-        )
-        ''',
+def fetch_columns(query, params=None):
+    # Plain tuple cursor, no per-row DictRow; returns (column names, column value tuples)
+    def operation(cur):
+        cur.execute(query, params or ())
+        names = [column.name for column in cur.description]
+        rows = cur.fetchall()
+        columns = list(zip(*rows)) if rows else [() for _ in names]
+        return names, columns
+    return execute_db_operation(operation, fetch=True, cursor_factory=None)
+
+def stream_query(query, params=None, batch_size=STREAM_BATCH_SIZE):
+    # Named (server-side) cursor: rows stay in Postgres until each batch is requested
+    with pooled_connection() as conn:
+        with conn:
+            with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+                cur.itersize = batch_size
+                cur.execute(query, params or ())
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+
+def explain_query(query, params=None, analyze=False, disable_seqscan=False):
+    # disable_seqscan lets small development databases show the plan a large table would get
+    def operation(cur):
+        if disable_seqscan:
+            cur.execute("SET LOCAL enable_seqscan = off")
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+        cur.execute(prefix + query, params or ())
+        return [row[0] for row in cur.fetchall()]
+    return execute_db_operation(operation, fetch=True)
+
+def indexes_used(plan):
+    plan_text = "\n".join(plan)
+    return [name for name in MANAGED_INDEXES if name in plan_text]
+
+BASE_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS salary (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id),
+        amount REAL NOT NULL,
+        month INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        UNIQUE(user_id, month, year)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS categories (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id),
+        name TEXT NOT NULL,
+        UNIQUE(user_id, name)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS expenses (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id),
+        category_id INTEGER REFERENCES categories(id),
+        amount REAL NOT NULL,
+        description TEXT,
+        date TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    '''
+]
+
+DEFAULT_CATEGORIES = ['Eat & Drink', 'Rent', 'Transportation', 'Utilities', 'Entertainment', 'Shopping', 'Healthcare', 'Education']
+
+MANAGED_INDEXES = {
+    # Serves month range filters and the (date, created_at, id) keyset pagination order
+    'idx_expenses_user_date_created_id': 'CREATE INDEX IF NOT EXISTS idx_expenses_user_date_created_id ON expenses (user_id, date, created_at, id)',
+    'idx_expenses_user_created_at': 'CREATE INDEX IF NOT EXISTS idx_expenses_user_created_at ON expenses (user_id, created_at)',
+    'idx_expenses_category_id': 'CREATE INDEX IF NOT EXISTS idx_expenses_category_id ON expenses (category_id)',
+}
+
+MONTHLY_TOTALS_TABLE = '''
+CREATE TABLE IF NOT EXISTS monthly_category_totals (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    category_id INTEGER NOT NULL REFERENCES categories(id),
+    total DOUBLE PRECISION NOT NULL DEFAULT 0,
+    expense_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, year, month, category_id)
+)
+'''
+
+# Keeps monthly_category_totals in step with every write to expenses, including bulk loads
+MONTHLY_TOTALS_FUNCTION = '''
+CREATE OR REPLACE FUNCTION maintain_monthly_category_totals() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE')
+       AND OLD.date IS NOT NULL AND OLD.user_id IS NOT NULL AND OLD.category_id IS NOT NULL THEN
+        UPDATE monthly_category_totals
+        SET total = total - OLD.amount, expense_count = expense_count - 1
+        WHERE user_id = OLD.user_id
+          AND year = EXTRACT(YEAR FROM OLD.date)
+          AND month = EXTRACT(MONTH FROM OLD.date)
+          AND category_id = OLD.category_id;
+        DELETE FROM monthly_category_totals
+        WHERE user_id = OLD.user_id
+          AND year = EXTRACT(YEAR FROM OLD.date)
+          AND month = EXTRACT(MONTH FROM OLD.date)
+          AND category_id = OLD.category_id
+          AND expense_count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE')
+       AND NEW.date IS NOT NULL AND NEW.user_id IS NOT NULL AND NEW.category_id IS NOT NULL THEN
+        INSERT INTO monthly_category_totals (user_id, year, month, category_id, total, expense_count)
+        VALUES (NEW.user_id, EXTRACT(YEAR FROM NEW.date), EXTRACT(MONTH FROM NEW.date), NEW.category_id, NEW.amount, 1)
+        ON CONFLICT (user_id, year, month, category_id) DO UPDATE
+        SET total = monthly_category_totals.total + EXCLUDED.total,
+            expense_count = monthly_category_totals.expense_count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+'''
+
+MONTHLY_TOTALS_TRIGGER = '''
+CREATE TRIGGER expenses_monthly_category_totals
+AFTER INSERT OR DELETE OR UPDATE OF user_id, category_id, amount, date ON expenses
+FOR EACH ROW EXECUTE FUNCTION maintain_monthly_category_totals()
+'''
+
+# Version 5 adds the currency to the rollup key; amounts are summed per original currency
+MONTHLY_TOTALS_CURRENCY_FUNCTION = '''
+CREATE OR REPLACE FUNCTION maintain_monthly_category_totals() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE')
+       AND OLD.date IS NOT NULL AND OLD.user_id IS NOT NULL AND OLD.category_id IS NOT NULL THEN
+        UPDATE monthly_category_totals
+        SET total = total - OLD.amount, expense_count = expense_count - 1
+        WHERE user_id = OLD.user_id
+          AND year = EXTRACT(YEAR FROM OLD.date)
+          AND month = EXTRACT(MONTH FROM OLD.date)
+          AND category_id = OLD.category_id
+          AND currency = OLD.currency;
+        DELETE FROM monthly_category_totals
+        WHERE user_id = OLD.user_id
+          AND year = EXTRACT(YEAR FROM OLD.date)
+          AND month = EXTRACT(MONTH FROM OLD.date)
+          AND category_id = OLD.category_id
+          AND currency = OLD.currency
+          AND expense_count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE')
+       AND NEW.date IS NOT NULL AND NEW.user_id IS NOT NULL AND NEW.category_id IS NOT NULL THEN
+        INSERT INTO monthly_category_totals (user_id, year, month, category_id, currency, total, expense_count)
+        VALUES (NEW.user_id, EXTRACT(YEAR FROM NEW.date), EXTRACT(MONTH FROM NEW.date), NEW.category_id,
+                NEW.currency, NEW.amount, 1)
+        ON CONFLICT (user_id, year, month, category_id, currency) DO UPDATE
+        SET total = monthly_category_totals.total + EXCLUDED.total,
+            expense_count = monthly_category_totals.expense_count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+'''
+
+MONTHLY_TOTALS_CURRENCY_TRIGGER = '''
+CREATE TRIGGER expenses_monthly_category_totals
+AFTER INSERT OR DELETE OR UPDATE OF user_id, category_id, amount, date, currency ON expenses
+FOR EACH ROW EXECUTE FUNCTION maintain_monthly_category_totals()
+'''
+
+def _rebuild_monthly_totals(cur, user_id=None):
+    # amount is REAL and SUM(real) accumulates in float4; the trigger adds into a double
+    # precision total, so the rebuild sums in double precision to produce the same totals
+    # SHARE mode blocks concurrent expense writes so the rebuilt totals are exact
+    cur.execute("LOCK TABLE expenses IN SHARE MODE")
+    user_filter = " AND user_id = %s" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+    cur.execute("DELETE FROM monthly_category_totals WHERE TRUE" + user_filter, params)
+    cur.execute(
         '''
-        CREATE TABLE IF NOT EXISTS salary (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER REFERENCES users(id),
-            amount REAL NOT NULL,
-            month INTEGER NOT NULL,
-            year INTEGER NOT NULL,
-            UNIQUE(user_id, month, year)
-        )
+        INSERT INTO monthly_category_totals (user_id, year, month, category_id, currency, total, expense_count)
+        SELECT user_id, EXTRACT(YEAR FROM date), EXTRACT(MONTH FROM date), category_id, currency,
+               SUM(amount::double precision), COUNT(*)
+        FROM expenses
+        WHERE date IS NOT NULL AND user_id IS NOT NULL AND category_id IS NOT NULL
+        ''' + user_filter + '''
+        GROUP BY 1, 2, 3, 4, 5
         ''',
+        params
+    )
+    return cur.rowcount
+
+def rebuild_monthly_totals(user_id=None):
+    return execute_db_operation(lambda cur: _rebuild_monthly_totals(cur, user_id), fetch=True)
+
+def _retag_currency(cur, user_id, currency, from_currency):
+    # The UPDATE OF currency trigger moves each expense's amount to the matching rollup row
+    cur.execute("UPDATE expenses SET currency = %s WHERE user_id = %s AND currency = %s",
+                (currency, user_id, from_currency))
+    expenses = cur.rowcount
+    cur.execute("UPDATE salary SET currency = %s WHERE user_id = %s AND currency = %s",
+                (currency, user_id, from_currency))
+    return expenses, cur.rowcount
+
+def retag_currency(user_id, currency, from_currency='USD'):
+    # For rows stored under the wrong currency, e.g. history from before currencies were
+    # stored, which migration 5 tagged as USD. Amounts are relabelled, not converted.
+    return execute_db_operation(lambda cur: _retag_currency(cur, user_id, currency, from_currency), fetch=True)
+
+# Migrations are written to be safe on databases created before schema_migrations existed
+
+def _create_base_tables(cur):
+    for statement in BASE_TABLES:
+        cur.execute(statement)
+    cur.execute(
         '''
-        CREATE TABLE IF NOT EXISTS categories (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER REFERENCES users(id),
-            name TEXT NOT NULL,
-            UNIQUE(user_id, name)
-        )
+        INSERT INTO categories (name, user_id)
+        SELECT name, NULL FROM unnest(%s::text[]) AS defaults(name)
+        WHERE NOT EXISTS (SELECT 1 FROM categories c WHERE c.user_id IS NULL AND c.name = defaults.name)
         ''',
-        '''
-        CREATE TABLE IF NOT EXISTS expenses (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER REFERENCES users(id),
-            category_id INTEGER REFERENCES categories(id),
-            amount REAL NOT NULL,
-            description TEXT,
-            date TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        (DEFAULT_CATEGORIES,)
+    )
+
+def _create_expense_indexes(cur):
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (user_id, date)")
+    cur.execute(MANAGED_INDEXES['idx_expenses_user_created_at'])
+    cur.execute(MANAGED_INDEXES['idx_expenses_category_id'])
+
+def _create_monthly_totals(cur):
+    cur.execute("SELECT to_regclass('public.monthly_category_totals')")
+    table_existed = cur.fetchone()[0] is not None
+    cur.execute(MONTHLY_TOTALS_TABLE)
+    cur.execute(MONTHLY_TOTALS_FUNCTION)
+    cur.execute("SELECT 1 FROM pg_trigger WHERE tgname = 'expenses_monthly_category_totals'")
+    if cur.fetchone() is None:
+        cur.execute(MONTHLY_TOTALS_TRIGGER)
+    if not table_existed:
+        # Frozen copy of the pre-currency backfill; expenses has no currency column yet at this version
+        cur.execute(
+            '''
+            INSERT INTO monthly_category_totals (user_id, year, month, category_id, total, expense_count)
+            SELECT user_id, EXTRACT(YEAR FROM date), EXTRACT(MONTH FROM date), category_id,
+                   SUM(amount::double precision), COUNT(*)
+            FROM expenses
+            WHERE date IS NOT NULL AND user_id IS NOT NULL AND category_id IS NOT NULL
+            GROUP BY 1, 2, 3, 4
+            '''
         )
-        '''
-    ]
-    for operation in operations:
-        execute_db_operation(operation)
-    
-    default_categories = ['Eat & Drink', 'Rent', 'Transportation', 'Utilities', 'Entertainment', 'Shopping', 'Healthcare', 'Education']
-    existing_categories = execute_db_operation("SELECT name FROM categories WHERE user_id IS NULL", fetch=True)
-    existing_category_names = [cat['name'] for cat in existing_categories] if existing_categories else []
-    for category in default_categories:
-        if category not in existing_category_names:
-            execute_db_operation(
-                "INSERT INTO categories (name, user_id) VALUES (%s, NULL)",
-                (category,)
-            )
+        logging.info(f"Backfilled monthly_category_totals with {cur.rowcount} rows")
+
+def _create_expense_page_index(cur):
+    # Supersedes idx_expenses_user_date, which is a prefix of the new index
+    cur.execute(MANAGED_INDEXES['idx_expenses_user_date_created_id'])
+    cur.execute("DROP INDEX IF EXISTS idx_expenses_user_date")
+
+def _add_currencies(cur):
+    # Currency used to be a display setting only, so existing rows are tagged USD whatever the user
+    # displayed; 'manage.py retag-currency' relabels a user's history. PostgreSQL 11+ adds the
+    # defaulted columns without a rewrite.
+    for table in ('expenses', 'salary', 'monthly_category_totals'):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS currency CHAR(3) NOT NULL DEFAULT 'USD'")
+    cur.execute("ALTER TABLE monthly_category_totals DROP CONSTRAINT IF EXISTS monthly_category_totals_pkey")
+    cur.execute("ALTER TABLE monthly_category_totals ADD PRIMARY KEY (user_id, year, month, category_id, currency)")
+    cur.execute(MONTHLY_TOTALS_CURRENCY_FUNCTION)
+    cur.execute("DROP TRIGGER IF EXISTS expenses_monthly_category_totals ON expenses")
+    cur.execute(MONTHLY_TOTALS_CURRENCY_TRIGGER)
+
+def _recompute_monthly_totals(cur):
+    # Databases backfilled by migration 3 before it summed in double precision hold float4 totals
+    rows = _rebuild_monthly_totals(cur)
+    logging.info(f"Recomputed monthly_category_totals: {rows} rows")
+
+# Append new migrations with the next version number; never edit or reorder applied ones
+MIGRATIONS = [
+    (1, 'create base tables', _create_base_tables),
+    (2, 'create expense indexes', _create_expense_indexes),
+    (3, 'create monthly category totals', _create_monthly_totals),
+    (4, 'create expense pagination index', _create_expense_page_index),
+    (5, 'add currencies to expenses, salary and monthly totals', _add_currencies),
+    (6, 'recompute monthly totals in double precision', _recompute_monthly_totals),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+MIGRATION_LOCK_ID = 7_316_482_001
+
+SCHEMA_MIGRATIONS_TABLE = '''
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+'''
+
+_schema_version = None
+_schema_lock = threading.Lock()
+# Set while this thread is checking or migrating, so its own queries skip the check
+_schema_work = threading.local()
+
+@contextmanager
+def _schema_work_in_progress():
+    previous = getattr(_schema_work, 'active', False)
+    _schema_work.active = True
+    try:
+        yield
+    finally:
+        _schema_work.active = previous
+
+def _read_schema_version(cur):
+    cur.execute("SELECT to_regclass('public.schema_migrations')")
+    if cur.fetchone()[0] is None:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cur.fetchone()[0]
+
+def get_schema_version():
+    with _schema_work_in_progress():
+        return execute_db_operation(_read_schema_version, fetch=True)
+
+def migrate():
+    def operation(cur):
+        # Serialises workers that start at the same time; released at commit
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+        cur.execute(SCHEMA_MIGRATIONS_TABLE)
+        cur.execute("SELECT version FROM schema_migrations")
+        applied_versions = {row[0] for row in cur.fetchall()}
+        applied_now = []
+        for version, name, migration in MIGRATIONS:
+            if version in applied_versions:
+                continue
+            logging.info(f"Applying migration {version}: {name}")
+            migration(cur)
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            applied_now.append(version)
+        return applied_now
+    with _schema_work_in_progress():
+        return execute_db_operation(operation, fetch=True)
+
+def schema_is_current():
+    return _schema_version is not None and _schema_version >= LATEST_SCHEMA_VERSION
+
+def ensure_schema():
+    global _schema_version
+    if schema_is_current():
+        return
+    with _schema_lock:
+        if schema_is_current():
+            return
+        version = get_schema_version()
+        if version < LATEST_SCHEMA_VERSION and not AUTO_MIGRATE:
+            logging.error(f"Database schema is at version {version}, latest is {LATEST_SCHEMA_VERSION}; "
+                          f"run 'python manage.py migrate'")
+            _schema_version = version
+            return
+        if version < LATEST_SCHEMA_VERSION:
+            applied = migrate()
+            if applied:
+                logging.info(f"Applied migrations {applied}")
+            version = LATEST_SCHEMA_VERSION
+        _schema_version = version
+
+def initialize_database():
+    ensure_schema()
 
 def check_tables_exist():
-    tables = ['users', 'salary', 'categories', 'expenses']
+    tables = ['users', 'salary', 'categories', 'expenses', 'monthly_category_totals', 'schema_migrations']
     for table in tables:
         result = execute_db_operation(f"SELECT to_regclass('public.{table}')", fetch=True)
         if result and result[0][0]:
@@ -1,6 +1,99 @@
+import inspect
+import functools
 import pandas as pd
-from database import execute_db_operation, fetch_query
-from datetime import datetime
+from psycopg2.extras import execute_values
+from database import execute_db_operation, fetch_columns, explain_query, transaction
+from cache import TTLCache, MISSING
+from config import env
+from currency import (get_currency_symbol, get_fx_rates, fx_rates_version, convert_amount,
+                      convert_amounts)
+from exporters import export_expenses
+from importers import (parse_statement, copy_line, CopyStream, ImportRowError,
+                       ImportRowSkipped, ImportAborted, MAX_REPORTED_ERRORS)
+from datetime import datetime, date
+
+QUERY_CACHE_TTL = env('QUERY_CACHE_TTL', 60.0, float)
+QUERY_CACHE_MAX_ENTRIES = env('QUERY_CACHE_MAX_ENTRIES', 1024, int)
+
+EXPENSE_COLUMNS = {'id': 'int64', 'category': 'category', 'amount': 'float64', 'currency': 'category',
+                   'description': 'object', 'date': 'datetime64[ns]', 'created_at': 'datetime64[ns]'}
+# Rollup reads return one row per original currency; convert_totals folds them into one currency
+CATEGORY_TOTAL_COLUMNS = {'category': 'category', 'currency': 'category', 'amount': 'float64',
+                          'expense_count': 'int64'}
+MONTHLY_TOTAL_COLUMNS = {'year': 'int64', 'month': 'int64', 'currency': 'category', 'total_expenses': 'float64'}
+CATEGORY_MATRIX_COLUMNS = {'year': 'int64', 'month': 'int64', 'category': 'category', 'currency': 'category',
+                           'amount': 'float64'}
+
+def typed_frame(names, columns, dtypes):
+    # Each column is converted once from the cursor's values; NULL dates become NaT
+    return pd.DataFrame({name: pd.Series(values, dtype=dtypes.get(name, object))
+                         for name, values in zip(names, columns)}, columns=list(names))
+
+def fetch_frame(query, params, dtypes):
+    names, columns = fetch_columns(query, params)
+    return typed_frame(names, columns, dtypes)
+
+def empty_frame(dtypes):
+    return typed_frame(list(dtypes), [() for _ in dtypes], dtypes)
+
+def convert_totals(frame, keys, currency, value_column='amount'):
+    # Rows per (keys, currency) in, rows per keys out: one vectorized conversion, then a groupby sum
+    converted = frame.assign(**{value_column: convert_amounts(frame[value_column], frame['currency'], currency)})
+    return converted.drop(columns='currency').groupby(keys, observed=True, sort=False, as_index=False).sum()
+
+# Shared by every ExpenseTracker in the process; keys are (user_id, method name, args)
+query_cache = TTLCache(maxsize=QUERY_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL)
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(item) for item in value))
+    return value
+
+def _copy_result(value):
+    # Callers mutate the frames they get back, so never hand out the cached object
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, tuple):
+        return tuple(_copy_result(item) for item in value)
+    return value
+
+def cached_query(func):
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        call_args = tuple(_freeze(value) for value in list(bound.arguments.values())[1:])
+        key = (self.user_id, func.__name__, call_args)
+        result = query_cache.get(key)
+        if result is MISSING:
+            generation = query_cache.generation
+            result = func(self, *args, **kwargs)
+            query_cache.set(key, result, generation=generation)
+        return _copy_result(result)
+    return wrapper
+
+def get_query_cache_stats():
+    return query_cache.stats()
+
+def normalize_expense_date(expense_date):
+    if expense_date is None:
+        return datetime.now().date()
+    if isinstance(expense_date, str):
+        return datetime.strptime(expense_date, '%Y-%m-%d').date()
+    if isinstance(expense_date, datetime):
+        return expense_date.date()
+    return expense_date
+
+def month_range(month, year):
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
 
 class ExpenseTracker:
     def __init__(self, user_id, language='English', currency='USD'):
@@ -8,21 +101,59 @@ class ExpenseTracker:
         self.language = language
         self.currency = currency
 
-    def get_salary(self, month, year):
-        query = "SELECT amount FROM salary WHERE user_id = %s AND month = %s AND year = %s"
+    def _invalidate_categories(self):
+        query_cache.invalidate(lambda key: key[:2] == (self.user_id, 'get_categories'))
+
+    def _invalidate_months(self, months):
+        touched = set(months)
+
+        def affected(key):
+            user_id, name, args = key
+            if user_id != self.user_id:
+                return False
+            if name in ('get_expenses', 'get_expenses_page'):
+                month, year = args[:2]
+                return not (month and year) or (month, year) in touched
+            if name in ('_category_totals_by_currency', '_converted_category_totals'):
+                return args[:2] in touched
+            if name in ('_monthly_totals_by_currency', '_converted_monthly_totals',
+                        '_category_matrix_by_currency', '_converted_category_matrix'):
+                years, months_ = args[:2]
+                return any(year in years and month in months_ for month, year in touched)
+            return False
+
+        query_cache.invalidate(affected)
+
+    @cached_query
+    def _salary(self, month, year):
+        query = "SELECT amount, currency FROM salary WHERE user_id = %s AND month = %s AND year = %s"
         params = (self.user_id, month, year)
         result = execute_db_operation(query, params, fetch=True)
         if result:
-            return result[0]['amount']
+            return result[0]['amount'], result[0]['currency']
         else:
             return None
 
+    def get_salary(self, month, year):
+        # In the display currency, whatever currency the salary was entered in
+        salary = self._salary(month, year)
+        if salary is None:
+            return None
+        amount, currency = salary
+        return convert_amount(amount, currency, self.currency)
+
     def update_salary(self, amount, month, year):
-        query = "INSERT INTO salary (user_id, amount, month, year) VALUES (%s, %s, %s, %s) ON CONFLICT (user_id, month, year) DO UPDATE SET amount = EXCLUDED.amount RETURNING amount"
-        params = (self.user_id, amount, month, year)
+        query = """
+        INSERT INTO salary (user_id, amount, month, year, currency) VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (user_id, month, year) DO UPDATE SET amount = EXCLUDED.amount, currency = EXCLUDED.currency
+        RETURNING amount
+        """
+        params = (self.user_id, amount, month, year, self.currency)
         result = execute_db_operation(query, params, fetch=True)
+        query_cache.invalidate(lambda key: key == (self.user_id, '_salary', (month, year)))
         return result[0]['amount'] if result else None
 
+    @cached_query
     def get_categories(self):
         result = execute_db_operation(
             "SELECT name FROM categories WHERE user_id = %s OR user_id IS NULL ORDER BY name",
@@ -31,81 +162,352 @@ class ExpenseTracker:
         )
         return [category['name'] for category in result]
 
+    def _category_ids(self, cur):
+        # The user's own categories win over defaults with the same name
+        cur.execute(
+            "SELECT id, name FROM categories WHERE user_id = %s OR user_id IS NULL ORDER BY user_id NULLS LAST",
+            (self.user_id,)
+        )
+        category_ids = {}
+        for category in cur.fetchall():
+            category_ids.setdefault(category['name'], category['id'])
+        return category_ids
+
     def add_category(self, name):
-        check_query = "SELECT COUNT(*) as count FROM categories WHERE (user_id = %s OR user_id IS NULL) AND name = %s"
-        result = execute_db_operation(check_query, (self.user_id, name), fetch=True)
-        if result[0]['count'] > 0:
+        # Defaults (user_id IS NULL) are not covered by UNIQUE(user_id, name), hence NOT EXISTS
+        query = """
+        INSERT INTO categories (user_id, name)
+        SELECT %s, %s
+        WHERE NOT EXISTS (SELECT 1 FROM categories WHERE user_id IS NULL AND name = %s)
+        ON CONFLICT (user_id, name) DO NOTHING
+        RETURNING id
+        """
+        result = execute_db_operation(query, (self.user_id, name, name), fetch=True, idempotent=False)
+        if not result:
             return False, f"Category '{name}' already exists."
-
-        insert_query = "INSERT INTO categories (user_id, name) VALUES (%s, %s)"
-        execute_db_operation(insert_query, (self.user_id, name))
+        self._invalidate_categories()
         return True, f"Category '{name}' added successfully."
 
     def remove_category(self, name):
-        check_query = "SELECT COUNT(*) as count FROM expenses e JOIN categories c ON e.category_id = c.id WHERE c.user_id = %s AND c.name = %s"
-        result = execute_db_operation(check_query, (self.user_id, name), fetch=True)
-        if result[0]['count'] > 0:
-            return False, f"Cannot remove category '{name}'. It has associated expenses."
+        with transaction() as cur:
+            cur.execute(
+                """
+                DELETE FROM categories c
+                WHERE c.user_id = %s AND c.name = %s
+                  AND NOT EXISTS (SELECT 1 FROM expenses e WHERE e.category_id = c.id)
+                RETURNING c.id
+                """,
+                (self.user_id, name)
+            )
+            if cur.fetchone() is None:
+                cur.execute(
+                    "SELECT EXISTS (SELECT 1 FROM expenses e JOIN categories c ON e.category_id = c.id WHERE c.user_id = %s AND c.name = %s)",
+                    (self.user_id, name)
+                )
+                has_expenses = cur.fetchone()[0]
+            else:
+                has_expenses = None
 
-        delete_query = "DELETE FROM categories WHERE user_id = %s AND name = %s"
-        execute_db_operation(delete_query, (self.user_id, name), fetch=False)
-        
-        check_deleted_query = "SELECT COUNT(*) as count FROM categories WHERE user_id = %s AND name = %s"
-        result = execute_db_operation(check_deleted_query, (self.user_id, name), fetch=True)
-        if result[0]['count'] == 0:
+        if has_expenses is None:
+            self._invalidate_categories()
             return True, f"Category '{name}' removed successfully."
+        elif has_expenses:
+            return False, f"Cannot remove category '{name}'. It has associated expenses."
         else:
             return False, f"Failed to remove category '{name}'. It may not exist."
 
-    def add_expense(self, category, amount, description='', expense_date=None):
-        if expense_date is None:
-            expense_date = datetime.now().date()
-        elif isinstance(expense_date, str):
-            try:
-                expense_date = datetime.strptime(expense_date, '%Y-%m-%d').date()
-            except ValueError:
-                return False, "Invalid date format. Please use YYYY-MM-DD."
-        elif isinstance(expense_date, datetime):
-            expense_date = expense_date.date()
+    def add_expense(self, category, amount, description='', expense_date=None, currency=None):
+        try:
+            expense_date = normalize_expense_date(expense_date)
+        except ValueError:
+            return False, "Invalid date format. Please use YYYY-MM-DD."
+        currency = currency or self.currency
+        if currency not in get_fx_rates():
+            return False, f"Unknown currency '{currency}'."
 
         query = '''
-        INSERT INTO expenses (user_id, category_id, amount, description, date, created_at)
-        VALUES (%s, (SELECT id FROM categories WHERE (user_id = %s OR user_id IS NULL) AND name = %s LIMIT 1), %s, %s, %s, CURRENT_TIMESTAMP)
+        INSERT INTO expenses (user_id, category_id, amount, description, date, currency, created_at)
+        VALUES (%s, (SELECT id FROM categories WHERE (user_id = %s OR user_id IS NULL) AND name = %s LIMIT 1), %s, %s, %s, %s, CURRENT_TIMESTAMP)
         '''
-        params = (self.user_id, self.user_id, category, amount, description, expense_date)
+        params = (self.user_id, self.user_id, category, amount, description, expense_date, currency)
         
         try:
-            execute_db_operation(query, params)
+            execute_db_operation(query, params, idempotent=False)
+            self._invalidate_months([(expense_date.month, expense_date.year)])
             return True, "Expense added successfully."
         except Exception as e:
             return False, f"Failed to add expense: {str(e)}"
 
-    def get_expenses(self, month=None, year=None):
+    def add_expenses(self, expenses):
+        # expenses: iterable of dicts with category, amount and optional description/date/currency.
+        # Returns one (success, message) pair per item, in input order.
+        expenses = list(expenses)
+        outcomes = [None] * len(expenses)
+        rates = get_fx_rates()
+        rows = []
+        for index, expense in enumerate(expenses):
+            try:
+                expense_date = normalize_expense_date(expense.get('date'))
+            except ValueError:
+                outcomes[index] = (False, "Invalid date format. Please use YYYY-MM-DD.")
+                continue
+            try:
+                amount = float(expense['amount'])
+            except (KeyError, TypeError, ValueError):
+                outcomes[index] = (False, "Invalid amount.")
+                continue
+            currency = expense.get('currency') or self.currency
+            if currency not in rates:
+                outcomes[index] = (False, f"Unknown currency '{currency}'.")
+                continue
+            rows.append((index, expense.get('category'), amount, expense.get('description', ''), expense_date,
+                         currency))
+
+        inserted_indexes = []
+        try:
+            with transaction() as cur:
+                category_ids = self._category_ids(cur)
+
+                values = []
+                for index, category, amount, description, expense_date, currency in rows:
+                    category_id = category_ids.get(category)
+                    if category_id is None:
+                        outcomes[index] = (False, f"Unknown category '{category}'.")
+                        continue
+                    values.append((self.user_id, category_id, amount, description, expense_date, currency))
+                    inserted_indexes.append(index)
+                if values:
+                    returned = execute_values(
+                        cur,
+                        "INSERT INTO expenses (user_id, category_id, amount, description, date, currency) VALUES %s RETURNING id",
+                        values,
+                        template="(%s, %s, %s, %s, %s, %s)",
+                        fetch=True
+                    )
+                    # Multi-row INSERT ... RETURNING yields rows in VALUES order
+                    for index, row in zip(inserted_indexes, returned):
+                        outcomes[index] = (True, f"Expense {row['id']} added successfully.")
+        except Exception as e:
+            message = f"Failed to add expenses: {str(e)}"
+            return [outcome if outcome is not None and not outcome[0] else (False, message)
+                    for outcome in outcomes]
+        if inserted_indexes:
+            dates = {index: expense_date for index, _, _, _, expense_date, _ in rows}
+            self._invalidate_months({(dates[index].month, dates[index].year) for index in inserted_indexes})
+        return outcomes
+
+    def _expenses_query(self, month=None, year=None):
         query = """
-        SELECT e.id, c.name AS category, e.amount, e.description, e.date, e.created_at
+        SELECT e.id, c.name AS category, e.amount, e.currency, e.description, e.date, e.created_at
         FROM expenses e
         JOIN categories c ON e.category_id = c.id
         WHERE e.user_id = %s
         """
         params = [self.user_id]
         if month and year:
-            query += " AND EXTRACT(MONTH FROM e.date) = %s AND EXTRACT(YEAR FROM e.date) = %s"
-            params.extend([month, year])
+            # Half-open range so the (user_id, date, ...) index can be used
+            query += " AND e.date >= %s AND e.date < %s"
+            params.extend(month_range(month, year))
         query += " ORDER BY e.created_at DESC"
-        result = fetch_query(query, params)
-        return pd.DataFrame(result, columns=['id', 'category', 'amount', 'description', 'date', 'created_at'])
+        return query, params
+
+    def import_expenses(self, fileobj, file_format='csv', default_category=None,
+                        dry_run=False, strict=False, date_format='%Y-%m-%d', decimal='.'):
+        report = {'rows': 0, 'imported': 0, 'skipped': 0, 'error_count': 0, 'errors': [],
+                  'dry_run': dry_run, 'rolled_back': False}
+        touched_months = set()
+        rates = get_fx_rates()
+
+        def record_error(line_number, message):
+            report['error_count'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'line': line_number, 'error': message})
+
+        def copy_lines(exact_ids, folded_ids):
+            for line_number, row in parse_statement(fileobj, file_format, date_format, decimal):
+                report['rows'] += 1
+                # Skipped rows (OFX credits) are counted apart, so strict mode only aborts on errors
+                if isinstance(row, ImportRowSkipped):
+                    report['skipped'] += 1
+                    continue
+                if isinstance(row, ImportRowError):
+                    record_error(line_number, str(row))
+                    continue
+                category = row['category'] or default_category or ''
+                category_id = exact_ids.get(category, folded_ids.get(category.lower()))
+                if category_id is None:
+                    record_error(line_number, f"Unknown category '{category}'" if category else "Missing category")
+                    continue
+                currency = row['currency'] or self.currency
+                if currency not in rates:
+                    record_error(line_number, f"Unknown currency '{currency}'")
+                    continue
+                touched_months.add((row['date'].month, row['date'].year))
+                report['imported'] += 1
+                yield copy_line([self.user_id, category_id, row['amount'], row['description'], row['date'].isoformat(),
+                                 currency])
+
+        try:
+            with transaction() as cur:
+                exact_ids = self._category_ids(cur)
+                folded_ids = {}
+                for name, category_id in exact_ids.items():
+                    folded_ids.setdefault(name.lower(), category_id)
+
+                lines = copy_lines(exact_ids, folded_ids)
+                if dry_run:
+                    for _ in lines:
+                        pass
+                else:
+                    cur.copy_expert(
+                        "COPY expenses (user_id, category_id, amount, description, date, currency) FROM STDIN WITH (FORMAT csv)",
+                        CopyStream(lines)
+                    )
+                    if strict and report['error_count']:
+                        raise ImportAborted(f"{report['error_count']} row(s) failed validation")
+        except ImportAborted:
+            report['imported'] = 0
+            report['rolled_back'] = True
+            return report
+        if not dry_run and report['imported']:
+            self._invalidate_months(touched_months)
+        return report
+
+    def export_expenses(self, output, file_format='csv'):
+        return export_expenses(self.user_id, output, file_format)
+
+    @cached_query
+    def get_expenses(self, month=None, year=None):
+        query, params = self._expenses_query(month, year)
+        return fetch_frame(query, params, EXPENSE_COLUMNS)
+
+    @cached_query
+    def get_expenses_page(self, month, year, after=None, limit=20):
+        query = """
+        SELECT e.id, c.name AS category, e.amount, e.currency, e.description, e.date, e.created_at
+        FROM expenses e
+        JOIN categories c ON e.category_id = c.id
+        WHERE e.user_id = %s AND e.date >= %s AND e.date < %s
+        """
+        params = [self.user_id, *month_range(month, year)]
+        if after is not None:
+            # Keyset cursor: (date, created_at, id) of the last row on the previous page
+            query += " AND (e.date, e.created_at, e.id) < (%s, %s, %s)"
+            params.extend(after)
+        query += " ORDER BY e.date DESC, e.created_at DESC, e.id DESC LIMIT %s"
+        params.append(limit + 1)
+        names, columns = fetch_columns(query, params)
+        has_more = len(columns[0]) > limit
+        columns = [values[:limit] for values in columns]
+        next_cursor = None
+        if has_more:
+            last_row = {name: values[-1] for name, values in zip(names, columns)}
+            next_cursor = (last_row['date'], last_row['created_at'], last_row['id'])
+        return typed_frame(names, columns, EXPENSE_COLUMNS), next_cursor
+
+    # Totals are read per original currency and cached raw; the converted frames are cached per
+    # display currency and FX file version, so switching currency never goes back to the database
+
+    @cached_query
+    def _category_totals_by_currency(self, month, year):
+        query = """
+        SELECT c.name AS category, t.currency, SUM(t.total) AS amount, SUM(t.expense_count) AS expense_count
+        FROM monthly_category_totals t
+        JOIN categories c ON t.category_id = c.id
+        WHERE t.user_id = %s AND t.year = %s AND t.month = %s
+        GROUP BY c.name, t.currency
+        """
+        return fetch_frame(query, (self.user_id, year, month), CATEGORY_TOTAL_COLUMNS)
+
+    @cached_query
+    def _converted_category_totals(self, month, year, currency, rates_version):
+        totals_df = convert_totals(self._category_totals_by_currency(month, year), ['category'], currency)
+        return totals_df.sort_values('amount', ascending=False, ignore_index=True)
+
+    def get_category_totals(self, month, year):
+        return self._converted_category_totals(month, year, self.currency, fx_rates_version())
+
+    @cached_query
+    def _monthly_totals_by_currency(self, years, months):
+        years = sorted({int(year) for year in years})
+        months = sorted({int(month) for month in months})
+        if not years or not months:
+            return empty_frame(MONTHLY_TOTAL_COLUMNS)
+        query = """
+        SELECT year, month, currency, SUM(total) AS total_expenses
+        FROM monthly_category_totals
+        WHERE user_id = %s AND year = ANY(%s) AND month = ANY(%s)
+        GROUP BY year, month, currency
+        ORDER BY year, month
+        """
+        params = (self.user_id, years, months)
+        return fetch_frame(query, params, MONTHLY_TOTAL_COLUMNS)
+
+    @cached_query
+    def _converted_monthly_totals(self, years, months, currency, rates_version):
+        return convert_totals(self._monthly_totals_by_currency(years, months), ['year', 'month'], currency,
+                              value_column='total_expenses')
+
+    def get_monthly_totals(self, years, months):
+        return self._converted_monthly_totals(years, months, self.currency, fx_rates_version())
+
+    @cached_query
+    def _category_matrix_by_currency(self, years, months):
+        # One (year, month, category, currency) row per cell, aggregated from the rollup table
+        years = sorted({int(year) for year in years})
+        months = sorted({int(month) for month in months})
+        if not years or not months:
+            return empty_frame(CATEGORY_MATRIX_COLUMNS)
+        query = """
+        SELECT t.year, t.month, c.name AS category, t.currency, SUM(t.total) AS amount
+        FROM monthly_category_totals t
+        JOIN categories c ON t.category_id = c.id
+        WHERE t.user_id = %s AND t.year = ANY(%s) AND t.month = ANY(%s)
+        GROUP BY t.year, t.month, c.name, t.currency
+        ORDER BY t.year, t.month, c.name
+        """
+        params = (self.user_id, years, months)
+        return fetch_frame(query, params, CATEGORY_MATRIX_COLUMNS)
+
+    @cached_query
+    def _converted_category_matrix(self, years, months, currency, rates_version):
+        return convert_totals(self._category_matrix_by_currency(years, months), ['year', 'month', 'category'],
+                              currency)
+
+    def get_category_matrix(self, years, months):
+        return self._converted_category_matrix(years, months, self.currency, fx_rates_version())
+
+    def explain_get_expenses(self, month=None, year=None, analyze=False, disable_seqscan=False):
+        query, params = self._expenses_query(month, year)
+        return explain_query(query, params, analyze=analyze, disable_seqscan=disable_seqscan)
 
     def remove_expense(self, expense_id):
-        query = "DELETE FROM expenses WHERE id = %s AND user_id = %s"
+        query = "DELETE FROM expenses WHERE id = %s AND user_id = %s RETURNING date"
         params = (expense_id, self.user_id)
-        execute_db_operation(query, params, fetch=False)
-        
-        check_query = "SELECT COUNT(*) as count FROM expenses WHERE id = %s AND user_id = %s"
-        result = execute_db_operation(check_query, params, fetch=True)
-        if result[0]['count'] == 0:
+        result = execute_db_operation(query, params, fetch=True, idempotent=False)
+        if result:
+            removed_dates = [row['date'] for row in result if row['date'] is not None]
+            self._invalidate_months([(removed.month, removed.year) for removed in removed_dates])
             return True, "Expense removed successfully."
         else:
             return False, "Failed to remove expense. It may not exist or you don't have permission to remove it."
 
+    def remove_expenses(self, expense_ids):
+        # Returns one (success, message) pair per id, in input order
+        expense_ids = [int(expense_id) for expense_id in expense_ids]
+        if not expense_ids:
+            return []
+        query = "DELETE FROM expenses WHERE user_id = %s AND id = ANY(%s) RETURNING id, date"
+        result = execute_db_operation(query, (self.user_id, expense_ids), fetch=True, idempotent=False)
+        removed = {row['id']: row['date'] for row in result}
+        if removed:
+            self._invalidate_months({(removed_date.month, removed_date.year)
+                                     for removed_date in removed.values() if removed_date is not None})
+        return [
+            (True, f"Expense {expense_id} removed successfully.") if expense_id in removed
+            else (False, f"Failed to remove expense {expense_id}. It may not exist or you don't have permission to remove it.")
+            for expense_id in expense_ids
+        ]
+
     def get_currency_symbol(self):
-        return '₺' if self.currency == 'TRY' else '$'
+        return get_currency_symbol(self.currency)
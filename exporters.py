@@ -0,0 +1,103 @@
+import io
+import os
+import csv
+import tempfile
+import weakref
+from database import stream_query, STREAM_BATCH_SIZE
+
+EXPORT_COLUMNS = ['id', 'category', 'amount', 'currency', 'description', 'date', 'created_at']
+
+EXPORT_QUERY = """
+SELECT e.id, c.name AS category, e.amount, e.currency, e.description, e.date, e.created_at
+FROM expenses e
+JOIN categories c ON e.category_id = c.id
+WHERE e.user_id = %s
+ORDER BY e.date, e.id
+"""
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class ExportFile:
+    # A finished export on disk; the file is removed by discard() or once the owner
+    # (the Streamlit session that holds it) is garbage collected
+    def __init__(self, file_format):
+        handle, self.path = tempfile.mkstemp(prefix='expenses-', suffix=f".{EXPORT_FORMATS[file_format][1]}")
+        os.close(handle)
+        self.file_format = file_format
+        self.rows = 0
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+
+    def discard(self):
+        self._finalizer()
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def available_formats():
+    return [name for name in EXPORT_FORMATS if name != 'parquet' or parquet_available()]
+
+def _write_csv(batches, output):
+    rows = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows(batch)
+        output.write(buffer.getvalue().encode('utf-8'))
+        buffer.seek(0)
+        buffer.truncate()
+        rows += len(batch)
+    output.write(buffer.getvalue().encode('utf-8'))
+    return rows
+
+def _write_parquet(batches, output):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package.")
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('category', pa.dictionary(pa.int32(), pa.string())),
+        ('amount', pa.float64()),
+        ('currency', pa.dictionary(pa.int8(), pa.string())),
+        ('description', pa.string()),
+        ('date', pa.timestamp('us')),
+        ('created_at', pa.timestamp('us')),
+    ])
+    rows = 0
+    # One row group per fetched batch keeps memory bounded by the batch size
+    with pq.ParquetWriter(output, schema) as writer:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema))
+            rows += len(batch)
+    return rows
+
+def export_expenses(user_id, output, file_format='csv', batch_size=STREAM_BATCH_SIZE):
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{file_format}'")
+    batches = stream_query(EXPORT_QUERY, (user_id,), batch_size)
+    try:
+        if file_format == 'parquet':
+            return _write_parquet(batches, output)
+        return _write_csv(batches, output)
+    finally:
+        # Returns the pooled connection even if writing stopped part-way
+        batches.close()
@@ -0,0 +1,167 @@
+import io
+import re
+import csv
+from datetime import datetime
+
+CSV_COLUMNS = ('date', 'category', 'amount', 'description', 'currency')
+MAX_REPORTED_ERRORS = 500
+
+OFX_TRANSACTION = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.IGNORECASE | re.DOTALL)
+OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+OFX_DEFAULT_CURRENCY = re.compile(r'<CURDEF>\s*([A-Za-z]{3})', re.IGNORECASE)
+
+class ImportRowError(ValueError):
+    pass
+
+class ImportRowSkipped(Exception):
+    # A row that is deliberately not imported, such as an OFX credit; not a validation error
+    pass
+
+class ImportAborted(Exception):
+    pass
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension in ('ofx', 'qfx'):
+        return 'ofx'
+    return 'csv'
+
+def as_text_stream(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+def _amount_pattern(decimal, thousands):
+    # Digits either ungrouped or in groups of three, then an optional fraction
+    d, t = re.escape(decimal), re.escape(thousands)
+    return re.compile(rf'[-+]?(?:\d{{1,3}}(?:{t}\d{{3}})+|\d+)(?:{d}\d+)?|[-+]?{d}\d+')
+
+AMOUNT_PATTERNS = {'.': _amount_pattern('.', ','), ',': _amount_pattern(',', '.')}
+
+def parse_amount(value, decimal='.'):
+    # The decimal separator is an import option, never guessed: "1,234" is 1234 with '.'
+    # and 1.234 with ','. Amounts that don't fit the chosen convention are row errors.
+    if decimal not in AMOUNT_PATTERNS:
+        raise ValueError(f"Unsupported decimal separator '{decimal}'")
+    cleaned = re.sub(r'[^\d.,\-+]', '', value or '')
+    if not AMOUNT_PATTERNS[decimal].fullmatch(cleaned):
+        raise ImportRowError(f"Invalid amount '{value}' for decimal separator '{decimal}'")
+    thousands = ',' if decimal == '.' else '.'
+    return float(cleaned.replace(thousands, '').replace(decimal, '.'))
+
+def parse_date(value, date_format='%Y-%m-%d'):
+    value = (value or '').strip()
+    try:
+        return datetime.strptime(value, date_format).date()
+    except ValueError:
+        raise ImportRowError(f"Invalid date '{value}', expected format {date_format}")
+
+def parse_csv(fileobj, date_format='%Y-%m-%d', decimal='.'):
+    # Yields (line_number, row) where row is either a dict of parsed fields or an ImportRowError
+    reader = csv.reader(as_text_stream(fileobj))
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [column.strip().lower() for column in header]
+    missing = [column for column in ('date', 'amount') if column not in columns]
+    if missing:
+        raise ValueError(f"CSV header is missing required column(s): {', '.join(missing)}")
+    index = {column: columns.index(column) for column in CSV_COLUMNS if column in columns}
+
+    for line_number, values in enumerate(reader, start=2):
+        if not any(value.strip() for value in values):
+            continue
+        fields = {name: values[position].strip() if position < len(values) else ''
+                  for name, position in index.items()}
+        try:
+            amount = parse_amount(fields.get('amount'), decimal)
+            if amount <= 0:
+                raise ImportRowError(f"Amount must be positive, got {amount}")
+            yield line_number, {
+                'date': parse_date(fields.get('date'), date_format),
+                'category': fields.get('category', ''),
+                'amount': amount,
+                'description': fields.get('description', ''),
+                'currency': fields.get('currency', '').upper(),
+            }
+        except ImportRowError as e:
+            yield line_number, e
+
+def _ofx_blocks(text_stream, chunk_size=64 * 1024):
+    # Yields (transaction block, statement currency); <CURDEF> sits in the statement,
+    # before its transaction list, and a file may hold several statements
+    buffer = ''
+    default_currency = ''
+    while True:
+        chunk = text_stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        last_end = 0
+        for match in OFX_TRANSACTION.finditer(buffer):
+            for currency in OFX_DEFAULT_CURRENCY.findall(buffer, last_end, match.start()):
+                default_currency = currency.upper()
+            yield match.group(1), default_currency
+            last_end = match.end()
+        buffer = buffer[last_end:]
+
+def parse_ofx(fileobj):
+    # OFX has no categories; debits become expenses and credits are yielded as ImportRowSkipped
+    for number, (block, default_currency) in enumerate(_ofx_blocks(as_text_stream(fileobj)), start=1):
+        fields = {name.upper(): value.strip() for name, value in OFX_FIELD.findall(block)}
+        # <CURRENCY> means the amount is in that currency; under <ORIGCURRENCY> it is
+        # already in the statement currency
+        currency = default_currency
+        if '<CURRENCY>' in block.upper() and fields.get('CURSYM'):
+            currency = fields['CURSYM'].upper()
+        try:
+            amount = parse_amount(fields.get('TRNAMT'))
+            if amount >= 0:
+                yield number, ImportRowSkipped(f"Skipped credit of {amount:.2f}")
+                continue
+            posted = fields.get('DTPOSTED', '')[:8]
+            description = ' - '.join(value for value in (fields.get('NAME'), fields.get('MEMO')) if value)
+            yield number, {
+                'date': parse_date(posted, '%Y%m%d'),
+                'category': '',
+                'amount': -amount,
+                'description': description,
+                'currency': currency,
+            }
+        except ImportRowError as e:
+            yield number, e
+
+def parse_statement(fileobj, file_format, date_format='%Y-%m-%d', decimal='.'):
+    # OFX amounts always use '.', so decimal only applies to CSV
+    if file_format == 'ofx':
+        return parse_ofx(fileobj)
+    if file_format == 'csv':
+        return parse_csv(fileobj, date_format, decimal)
+    raise ValueError(f"Unsupported import format '{file_format}'")
+
+class CopyStream(io.RawIOBase):
+    # File-like view over an iterator of text lines, consumed lazily by cursor.copy_expert
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lines).encode('utf-8')
+            except StopIteration:
+                break
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+def copy_line(values):
+    # Quoting text keeps empty descriptions as '' rather than NULL under COPY's CSV format
+    output = io.StringIO()
+    csv.writer(output, lineterminator='\n', quoting=csv.QUOTE_NONNUMERIC).writerow(values)
+    return output.getvalue()
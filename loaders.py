@@ -0,0 +1,46 @@
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from config import env
+from database import POOL_MAX_SIZE
+
+# The shared pool can keep every pooled connection busy; each render is limited separately
+# so one render cannot take all of them
+LOADER_POOL_SIZE = env('DATA_LOADER_POOL_SIZE', POOL_MAX_SIZE, int)
+LOADER_MAX_WORKERS = env('DATA_LOADER_WORKERS', max(1, min(4, POOL_MAX_SIZE - 1)), int)
+
+_executor = ThreadPoolExecutor(max_workers=LOADER_POOL_SIZE, thread_name_prefix='data-loader')
+
+DashboardData = namedtuple('DashboardData', ['salary', 'categories', 'category_totals', 'expenses', 'next_cursor'])
+SummaryData = namedtuple('SummaryData', ['salary', 'expenses', 'category_totals'])
+
+def load_concurrently(calls, max_workers=LOADER_MAX_WORKERS):
+    # calls: {name: (function, args)}; independent reads run on the shared worker pool,
+    # at most max_workers of them at a time. The caller waits for a slot, not a worker.
+    slots = threading.BoundedSemaphore(max_workers)
+    futures = {}
+    for name, (function, args) in calls.items():
+        slots.acquire()
+        future = _executor.submit(function, *args)
+        future.add_done_callback(lambda _: slots.release())
+        futures[name] = future
+    return {name: future.result() for name, future in futures.items()}
+
+def load_dashboard_data(expense_tracker, month, year, after=None, limit=20):
+    results = load_concurrently({
+        'salary': (expense_tracker.get_salary, (month, year)),
+        'categories': (expense_tracker.get_categories, ()),
+        'category_totals': (expense_tracker.get_category_totals, (month, year)),
+        'expenses_page': (expense_tracker.get_expenses_page, (month, year, after, limit)),
+    })
+    expenses, next_cursor = results['expenses_page']
+    return DashboardData(results['salary'], results['categories'], results['category_totals'],
+                         expenses, next_cursor)
+
+def load_summary_data(expense_tracker, month, year):
+    results = load_concurrently({
+        'salary': (expense_tracker.get_salary, (month, year)),
+        'expenses': (expense_tracker.get_expenses, (month, year)),
+        'category_totals': (expense_tracker.get_category_totals, (month, year)),
+    })
+    return SummaryData(results['salary'], results['expenses'], results['category_totals'])
@@ -1,14 +1,18 @@
 import streamlit as st
-import pandas as pd
-from expense_tracker import ExpenseTracker
-from database import initialize_database, execute_db_operation
+from database import DatabaseUnavailable
+from currency import get_currency_symbol, available_currencies
 from utils import load_custom_css
+from importers import detect_format
+from exporters import available_formats, EXPORT_FORMATS, ExportFile
+from loaders import load_dashboard_data, load_summary_data
+from profiling import render_profile, render_phase
 from datetime import datetime, date as date_class
-from visualizations import create_expense_pie_chart, create_expense_comparison_chart
 from auth import login, logout, register, is_authenticated, authentication_required
 import logging
 import calendar
 
+EXPENSES_PAGE_SIZE = 20
+
 logging.basicConfig(filename='app.log',
                     level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -61,6 +65,27 @@ def load_translations():
             'Expense Distribution': 'Expense Distribution',
             'Expense Comparison Data': 'Expense Comparison Data',
             'Remove Expense': 'Remove Expense',
+            'Import Expenses': 'Import Expenses',
+            'Upload a CSV or OFX file': 'Upload a CSV or OFX file',
+            'Default category': 'Default category',
+            'Dry run (validate only)': 'Dry run (validate only)',
+            'Skip invalid rows': 'Skip invalid rows',
+            'Decimal separator': 'Decimal separator',
+            'Import': 'Import',
+            'Rows read': 'Rows read',
+            'Rows imported': 'Rows imported',
+            'Rows skipped': 'Rows skipped',
+            'Rows with errors': 'Rows with errors',
+            'Export Expenses': 'Export Expenses',
+            'Export format': 'Export format',
+            'Prepare Export': 'Prepare Export',
+            'Download': 'Download',
+            'Previous': 'Previous',
+            'Next': 'Next',
+            'Page': 'Page',
+            'Select expenses to remove': 'Select expenses to remove',
+            'Remove Selected': 'Remove Selected',
+            'Expenses removed': 'Expenses removed',
         },
         'Turkish': {
             'Expense Tracker': 'Gider Takibi',
@@ -104,6 +129,27 @@ def load_translations():
             'Expense Distribution': 'Gider Dağılımı',
             'Expense Comparison Data': 'Gider Karşılaştırma Verileri',
             'Remove Expense': 'Gideri Kaldır',
+            'Import Expenses': 'Giderleri İçe Aktar',
+            'Upload a CSV or OFX file': 'CSV veya OFX dosyası yükleyin',
+            'Default category': 'Varsayılan kategori',
+            'Dry run (validate only)': 'Deneme (yalnızca doğrula)',
+            'Skip invalid rows': 'Hatalı satırları atla',
+            'Decimal separator': 'Ondalık ayırıcı',
+            'Import': 'İçe Aktar',
+            'Rows read': 'Okunan satırlar',
+            'Rows imported': 'Aktarılan satırlar',
+            'Rows skipped': 'Atlanan satırlar',
+            'Rows with errors': 'Hatalı satırlar',
+            'Export Expenses': 'Giderleri Dışa Aktar',
+            'Export format': 'Dışa aktarma biçimi',
+            'Prepare Export': 'Dışa Aktarmayı Hazırla',
+            'Download': 'İndir',
+            'Previous': 'Önceki',
+            'Next': 'Sonraki',
+            'Page': 'Sayfa',
+            'Select expenses to remove': 'Kaldırılacak giderleri seçin',
+            'Remove Selected': 'Seçilenleri Kaldır',
+            'Expenses removed': 'Kaldırılan giderler',
         }
     }
 
@@ -127,10 +173,12 @@ def translate_month(month_name, lang):
 
 @authentication_required
 def show_expense_tracker():
-    expense_tracker = ExpenseTracker(st.session_state.user_id)
+    # Deferred so the login page renders without loading pandas
+    from expense_tracker import ExpenseTracker
     translations = load_translations()
     lang = st.session_state.get('language', 'English')
     currency = st.session_state.get('currency', 'USD')
+    expense_tracker = ExpenseTracker(st.session_state.user_id, currency=currency)
 
     if 'selected_month' not in st.session_state:
         st.session_state.selected_month = datetime.now().month - 1
@@ -158,13 +206,17 @@ def show_expense_tracker():
         st.session_state.current_page = "home"
 
     if st.session_state.current_page == "home":
-        show_dashboard(expense_tracker, translations, lang, currency)
+        with render_phase('show_dashboard'):
+            show_dashboard(expense_tracker, translations, lang, currency)
     elif st.session_state.current_page == "monthly_summary":
-        show_expense_summary(expense_tracker, translations, lang, currency)
+        with render_phase('show_expense_summary'):
+            show_expense_summary(expense_tracker, translations, lang, currency)
     elif st.session_state.current_page == "compare_expenses":
-        show_expense_comparison(expense_tracker, translations, lang, currency)
+        with render_phase('show_expense_comparison'):
+            show_expense_comparison(expense_tracker, translations, lang, currency)
     elif st.session_state.current_page == "user_settings":
-        show_settings(expense_tracker, translations, lang, currency)
+        with render_phase('show_settings'):
+            show_settings(expense_tracker, translations, lang, currency)
 
 def show_dashboard(expense_tracker, translations, lang, currency):
     with st.expander(translations[lang]["Select Month and Year"],
@@ -199,31 +251,61 @@ def show_dashboard(expense_tracker, translations, lang, currency):
     selected_month_num = months.index(
         months[st.session_state.selected_month]) + 1
 
+    cursors = get_expense_page_cursors(selected_month_num, selected_year)
+    with render_phase('load_dashboard_data'):
+        data = load_dashboard_data(expense_tracker, selected_month_num,
+                                   selected_year, after=cursors[-1],
+                                   limit=EXPENSES_PAGE_SIZE)
+
+    # Each section is a fragment: its own widgets rerun only that section, and
+    # a write reruns the app only because the other sections show the same data
+    show_salary_editor(expense_tracker, selected_month_num, selected_year,
+                       data.salary, translations, lang, currency)
+    show_add_expense(expense_tracker, selected_month_num, selected_year,
+                     data.categories, translations, lang)
+
+    with render_phase('show_category_totals'):
+        show_category_totals(expense_tracker, selected_month_num, selected_year,
+                             data.salary, translations, lang, currency,
+                             totals_df=data.category_totals)
+
+    st.subheader(translations[lang]["Expenses"])
+    with render_phase('show_expense_list'):
+        show_expense_list(expense_tracker, selected_month_num, selected_year,
+                          translations, lang, currency,
+                          page=(data.expenses, data.next_cursor),
+                          loaded_after=cursors[-1])
+
+@st.fragment
+def show_salary_editor(expense_tracker, month, year, current_salary,
+                       translations, lang, currency):
+    month_name = translate_month(date_class(year, month, 1).strftime('%B'), lang)
     with st.expander(translations[lang]["Monthly Salary"], expanded=True):
-        current_salary = expense_tracker.get_salary(selected_month_num,
-                                                    selected_year)
         salary = st.number_input(
-            f"{translations[lang]['Salary for']} {translate_month(months[selected_month_num-1], lang)} {selected_year}",
+            f"{translations[lang]['Salary for']} {month_name} {year}",
             min_value=0.0,
             step=100.0,
             value=float(current_salary) if current_salary is not None else 0.0)
         if st.button(translations[lang]["Update Salary"]):
             try:
                 updated_salary = expense_tracker.update_salary(
-                    salary, selected_month_num, selected_year)
+                    salary, month, year)
                 if updated_salary is not None:
                     st.success(
-                        f"{translations[lang]['Salary for']} {translate_month(months[selected_month_num-1], lang)} {selected_year} {translations[lang]['Update Salary']} {get_currency_symbol(currency)}{updated_salary:.2f}!"
+                        f"{translations[lang]['Salary for']} {month_name} {year} {translations[lang]['Update Salary']} {get_currency_symbol(currency)}{updated_salary:.2f}!"
                     )
                 else:
                     st.error("Failed to update salary. Please try again.")
+                # Remaining salary in the totals section depends on it
                 st.rerun()
             except Exception as e:
                 st.error(
                     f"An error occurred while updating the salary: {str(e)}")
 
+@st.fragment
+def show_add_expense(expense_tracker, month, year, categories, translations,
+                     lang):
     with st.expander(translations[lang]["Add Expense"], expanded=True):
-        categories = expense_tracker.get_categories()
         category = st.selectbox(translations[lang]["Category"],
                                 options=categories)
 
@@ -232,9 +314,9 @@ def show_dashboard(expense_tracker, translations, lang, currency):
                                  step=0.01)
         description = st.text_input(translations[lang]["Description"])
         
-        min_date = date_class(selected_year, selected_month_num, 1)
-        max_date = date_class(selected_year, selected_month_num, 1) + pd.offsets.MonthEnd(0)
-        default_date = date_class.today() if date_class.today().year == selected_year and date_class.today().month == selected_month_num else max_date
+        min_date = date_class(year, month, 1)
+        max_date = date_class(year, month, calendar.monthrange(year, month)[1])
+        default_date = date_class.today() if date_class.today().year == year and date_class.today().month == month else max_date
         expense_date = st.date_input(translations[lang]["Expense Date"], 
                                      value=default_date, 
                                      min_value=min_date, 
@@ -244,48 +326,104 @@ def show_dashboard(expense_tracker, translations, lang, currency):
             success, message = expense_tracker.add_expense(category, amount, description, expense_date)
             if success:
                 st.success(message)
+                # Totals and the expense list both change
                 st.rerun()
             else:
                 st.error(message)
 
-    show_category_totals(expense_tracker, selected_month_num, selected_year,
-                         salary, translations, lang, currency)
+def get_expense_page_cursors(month, year):
+    # One keyset cursor per visited page; the last one fetches the current page
+    page_key = (year, month)
+    if st.session_state.get('expense_page_key') != page_key:
+        st.session_state.expense_page_key = page_key
+        st.session_state.expense_page_cursors = [None]
+    return st.session_state.expense_page_cursors
+
+@st.fragment
+def show_expense_list(expense_tracker, month, year, translations, lang,
+                      currency, page=None, loaded_after=None):
+    cursors = get_expense_page_cursors(month, year)
+    # A fragment rerun gets the arguments of the last full run, so a page
+    # preloaded for another cursor is fetched again
+    if page is None or loaded_after != cursors[-1]:
+        page = expense_tracker.get_expenses_page(month, year,
+                                                 after=cursors[-1],
+                                                 limit=EXPENSES_PAGE_SIZE)
+    expenses_df, next_cursor = page
+    # A later page emptied by a delete falls back to the previous one in place; this also
+    # runs during full-app reruns, where a fragment-scoped rerun is not allowed
+    while expenses_df.empty and len(cursors) > 1:
+        cursors.pop()
+        expenses_df, next_cursor = expense_tracker.get_expenses_page(month, year,
+                                                                     after=cursors[-1],
+                                                                     limit=EXPENSES_PAGE_SIZE)
 
-    st.subheader(translations[lang]["Expenses"])
-    expenses_df = expense_tracker.get_expenses(selected_month_num,
-                                               selected_year)
     if not expenses_df.empty:
-        expenses_df['date'] = pd.to_datetime(expenses_df['date'])
-        expenses_df['created_at'] = pd.to_datetime(expenses_df['created_at'])
-        expenses_df = expenses_df.sort_values('date', ascending=False)
-
-        for date, group in expenses_df.groupby(expenses_df['date'].dt.date,
-                                               sort=False):
-            day_expenses = group.sort_values(
-                'created_at',
-                ascending=False)
-            st.write(f"**{date.strftime('%Y-%m-%d')}**")
-
-            for _, row in day_expenses.iterrows():
-                with st.expander(
-                        f"{row['category']} - {get_currency_symbol(currency)}{row['amount']:.2f}"
-                ):
-                    st.write(
-                        f"{translations[lang]['Description']}: {row['description']}"
-                    )
-                    if st.button(translations[lang]["Remove Expense"],
-                                 key=f"remove_{row['id']}"):
-                        success, message = expense_tracker.remove_expense(
-                            row['id'])
-                        if success:
-                            st.success(message)
-                            st.rerun()
-                        else:
-                            st.error(message)
+        with render_phase('expense_rows'):
+            for date, day_expenses in expenses_df.groupby(
+                    expenses_df['date'].dt.date, sort=False):
+                st.write(f"**{date.strftime('%Y-%m-%d')}**")
+
+                for row in day_expenses.itertuples(index=False):
+                    with render_phase('expense_row'), st.expander(
+                            f"{row.category} - {get_currency_symbol(row.currency)}{row.amount:.2f}"
+                    ):
+                        st.write(
+                            f"{translations[lang]['Description']}: {row.description}"
+                        )
+                        if st.button(translations[lang]["Remove Expense"],
+                                     key=f"remove_{row.id}"):
+                            success, message = expense_tracker.remove_expense(
+                                int(row.id))
+                            if success:
+                                st.success(message)
+                                # Category totals change as well
+                                st.rerun()
+                            else:
+                                st.error(message)
+
+        page_labels = {
+            int(row.id):
+            f"{row.date:%Y-%m-%d} {row.category} - {get_currency_symbol(row.currency)}{row.amount:.2f}"
+            for row in expenses_df.itertuples(index=False)
+        }
+        selected_ids = st.multiselect(
+            translations[lang]["Select expenses to remove"],
+            options=list(page_labels),
+            format_func=page_labels.get,
+            key=f"remove_selected_{year}_{month}_{len(cursors)}")
+        if selected_ids and st.button(translations[lang]["Remove Selected"]):
+            outcomes = expense_tracker.remove_expenses(selected_ids)
+            failures = [message for success, message in outcomes if not success]
+            removed_count = len(outcomes) - len(failures)
+            if removed_count:
+                st.success(
+                    f"{translations[lang]['Expenses removed']}: {removed_count}")
+            for message in failures:
+                st.error(message)
+            if not failures:
+                st.rerun()
+
+        # Paging happens in on_click callbacks, which run before the fragment reruns; an
+        # explicit fragment-scoped rerun fails when the click is handled in a full-app run
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if len(cursors) > 1:
+                st.button(translations[lang]["Previous"],
+                          key="expenses_previous_page",
+                          on_click=cursors.pop)
+        with col2:
+            st.caption(f"{translations[lang]['Page']} {len(cursors)}")
+        with col3:
+            if next_cursor is not None:
+                st.button(translations[lang]["Next"],
+                          key="expenses_next_page",
+                          on_click=cursors.append,
+                          args=(next_cursor,))
 
     else:
         st.info(
-            f"{translations[lang]['No expenses recorded for']} {translate_month(months[selected_month_num-1], lang)} {selected_year}."
+            f"{translations[lang]['No expenses recorded for']} {translate_month(date_class(year, month, 1).strftime('%B'), lang)} {year}."
         )
 
 def show_expense_summary(expense_tracker, translations, lang, currency):
@@ -305,16 +443,19 @@ def show_expense_summary(expense_tracker, translations, lang, currency):
     selected_month_num = months.index(
         months[translated_months.index(selected_month)]) + 1
 
-    salary = expense_tracker.get_salary(selected_month_num, selected_year)
-    expenses_df = expense_tracker.get_expenses(selected_month_num,
-                                               selected_year)
+    with render_phase('load_summary_data'):
+        data = load_summary_data(expense_tracker, selected_month_num,
+                                 selected_year)
+    salary = data.salary
+    expenses_df = data.expenses
 
     if not expenses_df.empty:
         st.subheader(
             f"{translations[lang]['Expenses']} {translate_month(months[selected_month_num-1], lang)} {selected_year}"
         )
         st.dataframe(expenses_df)
-        total_expenses = expenses_df['amount'].sum()
+        category_totals_df = data.category_totals
+        total_expenses = category_totals_df['amount'].sum()
         if salary is not None:
             remaining_salary = salary - total_expenses
             st.info(
@@ -331,8 +472,10 @@ def show_expense_summary(expense_tracker, translations, lang, currency):
                        ["No salary information available for this month"])
 
         st.subheader(translations[lang]["Expense Distribution"])
-        fig = create_expense_pie_chart(expenses_df,
-                                       get_currency_symbol(currency), lang)
+        from visualizations import create_expense_pie_chart
+        with render_phase('create_expense_pie_chart'):
+            fig = create_expense_pie_chart(category_totals_df,
+                                           get_currency_symbol(currency), lang)
         st.plotly_chart(fig)
     else:
         st.info(
@@ -371,25 +514,17 @@ def show_expense_comparison(expense_tracker, translations, lang, currency):
     ]
 
     if selected_years and selected_months:
-        comparison_data = []
-        for year in selected_years:
-            for month_num in selected_month_nums:
-                expenses_df = expense_tracker.get_expenses(month_num, year)
-                if not expenses_df.empty:
-                    total_expenses = expenses_df['amount'].sum()
-                    comparison_data.append({
-                        'year':
-                        year,
-                        'month':
-                        translate_month(months[month_num - 1], lang),
-                        'total_expenses':
-                        float(total_expenses)
-                    })
-
-        if comparison_data:
-            comparison_df = pd.DataFrame(comparison_data)
-            fig = create_expense_comparison_chart(
-                comparison_df, get_currency_symbol(currency), lang)
+        with render_phase('get_monthly_totals'):
+            comparison_df = expense_tracker.get_monthly_totals(
+                selected_years, selected_month_nums)
+
+        if not comparison_df.empty:
+            comparison_df['month'] = comparison_df['month'].map(
+                lambda month_num: translate_month(months[month_num - 1], lang))
+            from visualizations import create_expense_comparison_chart
+            with render_phase('create_expense_comparison_chart'):
+                fig = create_expense_comparison_chart(
+                    comparison_df, get_currency_symbol(currency), lang)
             st.plotly_chart(fig)
 
             st.subheader(translations[lang]["Expense Comparison Data"])
@@ -405,11 +540,12 @@ def show_settings(expense_tracker, translations, lang, currency):
     st.title(translations[lang]["User Settings"])
 
     st.subheader(translations[lang]["Currency Settings"])
-    currency_options = ["USD", "TRY"]
+    currency_options = available_currencies()
+    current_currency = st.session_state.get('currency', 'USD')
     selected_currency = st.selectbox(
         translations[lang]["Select Currency"],
         options=currency_options,
-        index=currency_options.index(st.session_state.get('currency', 'USD')))
+        index=currency_options.index(current_currency) if current_currency in currency_options else 0)
     if selected_currency != st.session_state.get('currency', 'USD'):
         st.session_state.currency = selected_currency
         st.success(
@@ -455,19 +591,103 @@ def show_settings(expense_tracker, translations, lang, currency):
             else:
                 st.error(message)
 
+    show_expense_import(expense_tracker, translations, lang)
+    show_expense_export(expense_tracker, translations, lang)
+
+def show_expense_import(expense_tracker, translations, lang):
+    st.subheader(translations[lang]["Import Expenses"])
+    uploaded_file = st.file_uploader(
+        translations[lang]["Upload a CSV or OFX file"],
+        type=["csv", "ofx", "qfx"])
+    st.caption("CSV columns: date (YYYY-MM-DD), category, amount, description")
+    default_category = st.selectbox(translations[lang]["Default category"],
+                                    options=expense_tracker.get_categories(),
+                                    key="import_default_category")
+    decimal = st.radio(translations[lang]["Decimal separator"],
+                       options=['.', ','],
+                       format_func=lambda separator: {'.': '1,234.56', ',': '1.234,56'}[separator],
+                       horizontal=True,
+                       key="import_decimal")
+    col1, col2 = st.columns(2)
+    with col1:
+        dry_run = st.checkbox(translations[lang]["Dry run (validate only)"],
+                              value=True)
+    with col2:
+        skip_invalid = st.checkbox(translations[lang]["Skip invalid rows"],
+                                   value=True)
+
+    if uploaded_file is not None and st.button(translations[lang]["Import"]):
+        try:
+            report = expense_tracker.import_expenses(
+                uploaded_file,
+                file_format=detect_format(uploaded_file.name),
+                default_category=default_category,
+                dry_run=dry_run,
+                strict=not skip_invalid,
+                decimal=decimal)
+        except Exception as e:
+            st.error(f"Import failed: {str(e)}")
+            return
+
+        st.info(
+            f"{translations[lang]['Rows read']}: {report['rows']} | "
+            f"{translations[lang]['Rows imported']}: {report['imported']} | "
+            f"{translations[lang]['Rows skipped']}: {report['skipped']} | "
+            f"{translations[lang]['Rows with errors']}: {report['error_count']}")
+        if report['rolled_back']:
+            st.error("No rows were imported because some rows failed validation.")
+        elif dry_run:
+            st.success("Dry run complete. No expenses were saved.")
+        else:
+            st.success(f"Imported {report['imported']} expenses.")
+        if report['errors']:
+            st.subheader(translations[lang]["Rows with errors"])
+            st.dataframe(report['errors'])
+
+def show_expense_export(expense_tracker, translations, lang):
+    st.subheader(translations[lang]["Export Expenses"])
+    file_format = st.selectbox(translations[lang]["Export format"],
+                               options=available_formats())
+    if st.button(translations[lang]["Prepare Export"]):
+        # Rows are written to a temp file batch by batch, so the whole history
+        # is never held as Python objects while it is fetched
+        export = ExportFile(file_format)
+        try:
+            with open(export.path, 'wb') as output:
+                export.rows = expense_tracker.export_expenses(output, file_format)
+        except Exception as e:
+            export.discard()
+            st.error(f"Export failed: {str(e)}")
+            return
+        previous = st.session_state.get('expense_export')
+        if previous is not None:
+            previous.discard()
+        st.session_state.expense_export = export
+
+    export = st.session_state.get('expense_export')
+    if export is not None:
+        mime_type, extension = EXPORT_FORMATS[export.file_format]
+        # Between reruns the export stays on disk, not in session memory
+        with open(export.path, 'rb') as export_file:
+            st.download_button(f"{translations[lang]['Download']} ({export.rows})",
+                               data=export_file,
+                               file_name=f"expenses.{extension}",
+                               mime=mime_type)
+
+@st.fragment
 def show_category_totals(expense_tracker, month, year, salary, translations,
-                         lang, currency):
-    expenses_df = expense_tracker.get_expenses(month, year)
-    if not expenses_df.empty:
-        category_totals = expenses_df.groupby(
-            'category')['amount'].sum().sort_values(ascending=False)
+                         lang, currency, totals_df=None):
+    if totals_df is None:
+        totals_df = expense_tracker.get_category_totals(month, year)
+    if not totals_df.empty:
+        category_totals = totals_df.set_index('category')['amount']
         st.subheader(
             f"{translations[lang]['Total Expenses by Category for']} {translate_month(date_class(year, month, 1).strftime('%B'), lang)} {year}"
         )
         for category, total in category_totals.items():
             st.text(f"{category}: {get_currency_symbol(currency)}{total:.2f}")
 
-        total_expenses = float(expenses_df['amount'].sum())
+        total_expenses = float(category_totals.sum())
         if salary is not None and salary > 0:
             remaining_salary = float(salary) - total_expenses
             st.info(
@@ -497,23 +717,33 @@ def show_category_totals(expense_tracker, month, year, salary, translations,
             st.warning(translations[lang]
                        ["No salary information available for this month"])
 
-def get_currency_symbol(currency):
-    return '₺' if currency == 'TRY' else '$'
-
 def main():
-    load_custom_css()
-    translations = load_translations()
+    # Opt-in timing of each rerun's phases; see profiling.py
+    with render_profile():
+        try:
+            render_app()
+        except DatabaseUnavailable:
+            st.error("The database is temporarily unavailable. Please try again in a few seconds.")
+
+def render_app():
+    with render_phase('load_custom_css'):
+        load_custom_css()
+    with render_phase('load_translations'):
+        translations = load_translations()
 
     token = st.query_params.get('jwt_token')
     if token:
         st.session_state.token = token
         st.query_params.clear()
 
-    if is_authenticated():
+    with render_phase('is_authenticated'):
+        authenticated = is_authenticated()
+    if authenticated:
         st.success(
             f"{translations[st.session_state.get('language', 'English')]['Logged in as']} {st.session_state.user.lower()}"
         )
-        show_expense_tracker()
+        with render_phase('show_expense_tracker'):
+            show_expense_tracker()
     else:
         st.title(translations[st.session_state.get(
             'language', 'English')]["Welcome to Expense Tracker"])
@@ -547,7 +777,4 @@ def main():
 
 if __name__ == "__main__":
     logging.info("Starting application")
-    initialize_database()
-    logging.info("Database initialized")
-    print("Database initialization completed.")
     main()
\ No newline at end of file
@@ -0,0 +1,164 @@
+import sys
+import json
+import argparse
+import logging
+import subprocess
+from database import rebuild_monthly_totals, retag_currency, migrate, get_schema_version, LATEST_SCHEMA_VERSION
+from currency import available_currencies
+from exporters import export_expenses, EXPORT_FORMATS
+
+def rebuild_rollups(args):
+    rows = rebuild_monthly_totals(args.user_id)
+    scope = f"user {args.user_id}" if args.user_id is not None else "all users"
+    print(f"Rebuilt monthly_category_totals for {scope}: {rows} rows.")
+
+def retag_user_currency(args):
+    currency = args.currency.upper()
+    from_currency = args.from_currency.upper()
+    if currency not in available_currencies():
+        sys.exit(f"No FX rate for '{currency}'; add it to the rates file first.")
+    expenses, salaries = retag_currency(args.user_id, currency, from_currency)
+    print(f"Re-tagged {expenses} expenses and {salaries} salaries of user {args.user_id} "
+          f"from {from_currency} to {currency}.")
+
+def run_migrations(args):
+    applied = migrate()
+    if applied:
+        print(f"Applied migrations: {', '.join(str(version) for version in applied)}")
+    else:
+        print("Schema is up to date.")
+
+def schema_version(args):
+    print(f"Database schema version {get_schema_version()} (latest {LATEST_SCHEMA_VERSION}).")
+
+def export(args):
+    if args.output == '-':
+        rows = export_expenses(args.user_id, sys.stdout.buffer, args.format)
+    else:
+        with open(args.output, 'wb') as output:
+            rows = export_expenses(args.user_id, output, args.format)
+    print(f"Exported {rows} expenses.", file=sys.stderr)
+
+STARTUP_MODULES = ['config', 'database', 'auth', 'loaders', 'expense_tracker', 'visualizations', 'main']
+HEAVY_MODULES = ['pandas', 'plotly', 'pyarrow']
+
+STARTUP_PROBE = '''
+import sys, time, json
+started = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - started
+print(json.dumps({'seconds': elapsed, 'loaded': [name for name in sys.argv[2:] if name in sys.modules]}))
+'''
+
+def startup_report(args):
+    # Each module is imported in a fresh interpreter so earlier imports do not hide its cost
+    print(f"{'module':<18} {'import ms':>10}  heavy modules loaded")
+    for module in args.modules or STARTUP_MODULES:
+        result = subprocess.run([sys.executable, '-c', STARTUP_PROBE, module] + HEAVY_MODULES,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'
+            print(f"{module:<18} {'error':>10}  {error}")
+            continue
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{module:<18} {probe['seconds'] * 1000:>10.1f}  {', '.join(probe['loaded']) or '-'}")
+
+def benchmark(args):
+    from benchmark import run_benchmarks, compare_reports, print_comparison
+    report = run_benchmarks(users=args.users, years=args.years, expenses_per_month=args.expenses_per_month,
+                            custom_categories=args.custom_categories, seed=args.seed, repeat=args.repeat,
+                            include_writes=not args.no_writes, include_pages=not args.no_pages,
+                            keep_data=args.keep_data)
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+        print(f"Wrote {len(report['results'])} benchmark results to {args.output}.", file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        print_comparison(compare_reports(baseline, report), file=sys.stderr)
+
+def profile_report(args):
+    from profiling import load_samples, phase_percentiles, folded_stacks
+    samples = load_samples(args.input)
+    if not args.include_interrupted:
+        samples = [sample for sample in samples if sample['completed']]
+    if args.folded:
+        print('\n'.join(folded_stacks(samples)))
+        return
+    print(f"{len(samples)} reruns")
+    print(f"{'phase':<70} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stack, stats in sorted(phase_percentiles(samples).items()):
+        print(f"{stack:<70} {stats['count']:>6} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Expense Tracker maintenance commands")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help="Apply pending schema migrations")
+    migrate_parser.set_defaults(func=run_migrations)
+
+    version_parser = subparsers.add_parser('schema-version', help="Show the applied schema version")
+    version_parser.set_defaults(func=schema_version)
+
+    rebuild_parser = subparsers.add_parser('rebuild-rollups',
+                                           help="Recompute monthly per-category totals from raw expenses")
+    rebuild_parser.add_argument('--user-id', type=int, default=None,
+                                help="Only rebuild totals for this user")
+    rebuild_parser.set_defaults(func=rebuild_rollups)
+
+    retag_parser = subparsers.add_parser('retag-currency',
+                                         help="Relabel a user's stored amounts as another currency, without converting them")
+    retag_parser.add_argument('--user-id', type=int, required=True)
+    retag_parser.add_argument('--currency', required=True, help="Currency the amounts were really entered in")
+    retag_parser.add_argument('--from', dest='from_currency', default='USD',
+                              help="Only relabel rows currently tagged with this currency (default: USD)")
+    retag_parser.set_defaults(func=retag_user_currency)
+
+    export_parser = subparsers.add_parser('export', help="Export a user's full expense history")
+    export_parser.add_argument('--user-id', type=int, required=True)
+    export_parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    export_parser.add_argument('--output', default='-', help="Output file, or '-' for stdout")
+    export_parser.set_defaults(func=export)
+
+    startup_parser = subparsers.add_parser('startup-report',
+                                           help="Time module imports and list heavy dependencies they pull in")
+    startup_parser.add_argument('modules', nargs='*', help="Modules to probe (default: the app's modules)")
+    startup_parser.set_defaults(func=startup_report)
+
+    benchmark_parser = subparsers.add_parser('benchmark',
+                                             help="Seed synthetic data and time queries, charts and page renders")
+    benchmark_parser.add_argument('--users', type=int, default=5)
+    benchmark_parser.add_argument('--years', type=int, default=3, help="Years of expense history per user")
+    benchmark_parser.add_argument('--expenses-per-month', type=int, default=60,
+                                  help="Average expenses per month for a typical user")
+    benchmark_parser.add_argument('--custom-categories', type=int, default=4)
+    benchmark_parser.add_argument('--seed', type=int, default=0, help="Random seed for the synthetic data")
+    benchmark_parser.add_argument('--repeat', type=int, default=10, help="Timed runs per benchmark")
+    benchmark_parser.add_argument('--no-writes', action='store_true', help="Skip the write benchmarks")
+    benchmark_parser.add_argument('--no-pages', action='store_true', help="Skip the Streamlit page renders")
+    benchmark_parser.add_argument('--keep-data', action='store_true',
+                                  help="Leave the synthetic users in the database afterwards")
+    benchmark_parser.add_argument('--output', default='-', help="JSON output file, or '-' for stdout")
+    benchmark_parser.add_argument('--compare', help="Earlier JSON report to compare median timings against")
+    benchmark_parser.set_defaults(func=benchmark)
+
+    profile_parser = subparsers.add_parser('profile-report',
+                                           help="Summarize render profile samples written with PROFILE_RENDERS")
+    profile_parser.add_argument('--input', default=None, help="Samples file (default: PROFILE_SAMPLES_FILE)")
+    profile_parser.add_argument('--folded', action='store_true',
+                                help="Print folded stacks for flamegraph.pl or speedscope instead of percentiles")
+    profile_parser.add_argument('--include-interrupted', action='store_true',
+                                help="Include reruns cut short by st.rerun() or st.stop()")
+    profile_parser.set_defaults(func=profile_report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,87 @@
+import streamlit as st
+from datetime import datetime
+from auth import authentication_required, is_admin, get_auth_metrics
+from database import query_stats, get_query_stats, get_pool_stats, get_circuit_breaker_stats
+
+SORT_OPTIONS = {
+    "Total time": 'total_ms',
+    "p95 latency": 'p95_ms',
+    "Max latency": 'max_ms',
+    "Executions": 'count',
+    "Errors": 'errors',
+}
+
+@authentication_required
+def show_diagnostics():
+    st.title("Diagnostics")
+    if not is_admin():
+        st.error("This page is only available to administrators.")
+        return
+
+    from expense_tracker import get_query_cache_stats
+    from visualizations import get_figure_cache_stats
+
+    stats = get_query_stats()
+    pool_stats = get_pool_stats()
+    acquire = stats['connection_acquire']
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Statements executed", stats['executions'])
+    col2.metric("Statement errors", stats['errors'])
+    col3.metric("Connections in use", f"{pool_stats['in_use']} / {pool_stats['max_size']}")
+    col4.metric("Acquire p95", f"{acquire['p95_ms']:.1f} ms")
+
+    st.subheader("Top queries")
+    sort_label = st.selectbox("Order by", list(SORT_OPTIONS))
+    limit = st.slider("Queries shown", min_value=5, max_value=100, value=20, step=5)
+    top_queries = query_stats.top_statements(limit=limit, order_by=SORT_OPTIONS[sort_label])
+    if top_queries:
+        st.dataframe([
+            {
+                'SQL': row['sql'],
+                'Executions': row['count'],
+                'Total ms': round(row['total_ms'], 1),
+                'Mean ms': round(row['mean_ms'], 2),
+                'p50 ms': row['p50_ms'],
+                'p95 ms': row['p95_ms'],
+                'Max ms': round(row['max_ms'], 1),
+                'Rows': row['rows'],
+                'Errors': row['errors'],
+            }
+            for row in top_queries
+        ], use_container_width=True)
+    else:
+        st.info("No queries recorded yet in this process.")
+
+    st.subheader(f"Slow queries (over {stats['slow_query_ms']:.0f} ms)")
+    slow_queries = query_stats.slow_queries()
+    if slow_queries:
+        st.dataframe([
+            {
+                'At': datetime.fromtimestamp(entry['at']).strftime('%Y-%m-%d %H:%M:%S'),
+                'Elapsed ms': round(entry['elapsed_ms'], 1),
+                'Rows': entry['rows'],
+                'SQL': entry['sql'],
+            }
+            for entry in slow_queries
+        ], use_container_width=True)
+    else:
+        st.info("No slow queries recorded.")
+
+    with st.expander("Retries and circuit breaker"):
+        st.json({'retries': stats['retries'], 'circuit_breaker': get_circuit_breaker_stats()})
+    with st.expander("Connection pool"):
+        st.json({'pool': pool_stats, 'acquire': acquire})
+    with st.expander("Caches and sign-in"):
+        st.json({
+            'query_cache': get_query_cache_stats(),
+            'figure_cache': get_figure_cache_stats(),
+            'auth': get_auth_metrics(),
+        })
+
+    if st.button("Reset query statistics"):
+        query_stats.reset()
+        st.rerun()
+
+if __name__ == "__main__":
+    show_diagnostics()
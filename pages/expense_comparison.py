@@ -1,14 +1,17 @@
 import streamlit as st
-import pandas as pd
-from expense_tracker import ExpenseTracker
-from visualizations import create_category_comparison_chart
+from currency import get_currency_symbol
 from datetime import datetime
 from auth import authentication_required
 
 @authentication_required
 def show_expense_comparison():
     st.title("Expense Comparison")
-    expense_tracker = ExpenseTracker(st.session_state.user_id)
+    # Deferred so an unauthenticated visit only renders the login form
+    from expense_tracker import ExpenseTracker
+    from visualizations import create_category_comparison_chart
+    currency = st.session_state.get('currency', 'USD')
+    expense_tracker = ExpenseTracker(st.session_state.user_id, currency=currency)
+    symbol = get_currency_symbol(currency)
 
     # Month and year selection
     current_year = datetime.now().year
@@ -26,34 +29,28 @@ def show_expense_comparison():
     selected_month_nums = [months.index(month) + 1 for month in selected_months]
 
     if selected_years and selected_months:
-        comparison_data = []
-        for year in selected_years:
-            for month_num in selected_month_nums:
-                expenses_df = expense_tracker.get_expenses(month_num, year)
-                if not expenses_df.empty:
-                    grouped_expenses = expenses_df.groupby('category')['amount'].sum().reset_index()
-                    for _, row in grouped_expenses.iterrows():
-                        comparison_data.append({
-                            'year': year,
-                            'month': months[month_num - 1],
-                            'category': row['category'],
-                            'amount': float(row['amount'])
-                        })
+        comparison_df = expense_tracker.get_category_matrix(selected_years, selected_month_nums)
         
-        if comparison_data:
-            comparison_df = pd.DataFrame(comparison_data)
-            fig = create_category_comparison_chart(comparison_df)
+        if not comparison_df.empty:
+            month_names = dict(enumerate(months, start=1))
+            chart_df = comparison_df.assign(month=comparison_df['month'].map(month_names))
+            fig = create_category_comparison_chart(chart_df, symbol)
             st.plotly_chart(fig)
 
-            # Display the data in a table format
+            # Display the data in a table format; pivoted on month numbers so rows stay in calendar order
             st.subheader("Expense Comparison Data")
             pivot_df = comparison_df.pivot_table(
                 values='amount', 
                 index=['year', 'month'], 
                 columns='category', 
                 aggfunc='sum', 
-                fill_value=0
-            ).reset_index()
+                fill_value=0,
+                observed=True
+            )
+            # A CategoricalIndex cannot take the year/month columns back in reset_index
+            pivot_df.columns = pivot_df.columns.astype(str)
+            pivot_df = pivot_df.reset_index()
+            pivot_df['month'] = pivot_df['month'].map(month_names)
             st.dataframe(pivot_df)
         else:
             st.info("No data available for the selected months and years.")
@@ -1,13 +1,18 @@
 import streamlit as st
-from expense_tracker import ExpenseTracker
-from visualizations import create_expense_pie_chart
+from currency import get_currency_symbol
+from loaders import load_summary_data
 from datetime import datetime, date
 from auth import authentication_required
 
 @authentication_required
 def show_expense_summary():
     st.title("Expense Summary")
-    expense_tracker = ExpenseTracker(st.session_state.user_id)
+    # Deferred so an unauthenticated visit only renders the login form
+    from expense_tracker import ExpenseTracker
+    from visualizations import create_expense_pie_chart
+    currency = st.session_state.get('currency', 'USD')
+    expense_tracker = ExpenseTracker(st.session_state.user_id, currency=currency)
+    symbol = get_currency_symbol(currency)
 
     current_year = datetime.now().year
     years = list(range(current_year - 5, current_year + 1))
@@ -19,23 +24,25 @@ def show_expense_summary():
     selected_month = st.selectbox("Month", months, index=datetime.now().month - 1)
     selected_month_num = months.index(selected_month) + 1
     
-    salary = expense_tracker.get_salary(selected_month_num, selected_year)
-    expenses_df = expense_tracker.get_expenses(selected_month_num, selected_year)
+    data = load_summary_data(expense_tracker, selected_month_num, selected_year)
+    salary = data.salary
+    expenses_df = data.expenses
     
     if not expenses_df.empty:
         st.subheader(f"Expenses for {selected_month} {selected_year}")
         st.dataframe(expenses_df)
-        total_expenses = expenses_df['amount'].sum()
+        category_totals_df = data.category_totals
+        total_expenses = category_totals_df['amount'].sum()
         remaining_salary = salary - total_expenses
-        st.info(f"Total Expenses: ${float(total_expenses):.2f}")
-        st.success(f"Remaining Salary: ${float(remaining_salary):.2f}")
+        st.info(f"Total Expenses: {symbol}{float(total_expenses):.2f}")
+        st.success(f"Remaining Salary: {symbol}{float(remaining_salary):.2f}")
 
         st.subheader("Expense Distribution")
-        fig = create_expense_pie_chart(expenses_df)
+        fig = create_expense_pie_chart(category_totals_df, symbol)
         st.plotly_chart(fig)
     else:
         st.info(f"No expenses recorded for {selected_month} {selected_year}.")
-        st.success(f"Remaining Salary: ${float(salary):.2f}")
+        st.success(f"Remaining Salary: {symbol}{float(salary):.2f}")
 
 if __name__ == "__main__":
     show_expense_summary()
@@ -0,0 +1,138 @@
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import streamlit as st
+from config import env
+
+# Opt in for every session with PROFILE_RENDERS=true, or per session with ?profile=1
+PROFILE_RENDERS = env('PROFILE_RENDERS', False, bool)
+PROFILE_SAMPLES_FILE = env('PROFILE_SAMPLES_FILE', 'render_profile.jsonl')
+
+_current = threading.local()
+_samples_lock = threading.Lock()
+
+class RenderProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stack = []
+        self.phases = []  # (stack path, elapsed seconds) in completion order
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+def profiling_enabled():
+    requested = st.query_params.get('profile')
+    if requested is not None:
+        st.session_state.profile_renders = requested.lower() not in ('0', 'false', 'off')
+    return st.session_state.get('profile_renders', PROFILE_RENDERS)
+
+@contextmanager
+def render_phase(name):
+    # A no-op unless a profiled rerun is active on this thread
+    profile = getattr(_current, 'profile', None)
+    if profile is None:
+        yield
+        return
+    profile.stack.append(name)
+    path = ';'.join(profile.stack)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.phases.append((path, time.perf_counter() - started))
+        profile.stack.pop()
+
+def _write_sample(sample):
+    try:
+        with _samples_lock, open(PROFILE_SAMPLES_FILE, 'a') as samples_file:
+            samples_file.write(json.dumps(sample) + '\n')
+    except OSError as e:
+        logging.error(f"Could not write render profile sample: {e}")
+
+def _aggregate(phases):
+    # Repeated phases (one per row in a loop) collapse into one line: stack -> (calls, seconds)
+    totals = {}
+    for path, elapsed in phases:
+        calls, seconds = totals.get(path, (0, 0.0))
+        totals[path] = (calls + 1, seconds + elapsed)
+    return totals
+
+def _show_panel(profile, total):
+    with st.sidebar.expander("Render profile", expanded=True):
+        st.caption(f"Rerun took {total * 1000:.1f} ms")
+        st.dataframe([
+            {
+                'Phase': '  ' * path.count(';') + path.rsplit(';', 1)[-1],
+                'Calls': calls,
+                'ms': round(elapsed * 1000, 2),
+                '% of rerun': round(elapsed / total * 100, 1) if total else 0.0,
+            }
+            for path, (calls, elapsed) in sorted(_aggregate(profile.phases).items())
+        ], use_container_width=True, hide_index=True)
+
+@contextmanager
+def render_profile(page='main'):
+    if not profiling_enabled():
+        yield
+        return
+    profile = RenderProfile()
+    _current.profile = profile
+    completed = False
+    try:
+        yield
+        completed = True
+    finally:
+        _current.profile = None
+        total = profile.total()
+        # st.rerun() and st.stop() end a rerun by raising; those samples are kept but flagged
+        _write_sample({
+            'at': datetime.now().isoformat(timespec='milliseconds'),
+            'page': page,
+            'user_id': st.session_state.get('user_id'),
+            'completed': completed,
+            'total_ms': total * 1000,
+            'phases': [{'stack': path, 'ms': elapsed * 1000} for path, elapsed in profile.phases],
+        })
+        if completed:
+            _show_panel(profile, total)
+
+def load_samples(path=None):
+    with open(path or PROFILE_SAMPLES_FILE) as samples_file:
+        return [json.loads(line) for line in samples_file if line.strip()]
+
+def phase_percentiles(samples, percentiles=(50, 95, 99)):
+    # {stack: {'count', 'p50_ms', ...}} over every sample's phases, plus the whole rerun as 'rerun'
+    timings = {'rerun': [sample['total_ms'] for sample in samples]}
+    for sample in samples:
+        for phase in sample['phases']:
+            timings.setdefault(phase['stack'], []).append(phase['ms'])
+    summary = {}
+    for stack, values in timings.items():
+        ordered = sorted(values)
+        summary[stack] = {'count': len(ordered)}
+        for percentile in percentiles:
+            index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+            summary[stack][f'p{percentile}_ms'] = ordered[index]
+    return summary
+
+def folded_stacks(samples):
+    # Self time per stack in microseconds, rooted at the page, in the folded format
+    # that flamegraph.pl and speedscope read
+    totals = {}
+    for sample in samples:
+        stack_ms = {}
+        for phase in sample['phases']:
+            stack = f"{sample['page']};{phase['stack']}"
+            stack_ms[stack] = stack_ms.get(stack, 0.0) + phase['ms']
+        stack_ms[sample['page']] = sample['total_ms']
+        children_ms = {}
+        for stack, ms in stack_ms.items():
+            if ';' in stack:
+                parent = stack.rsplit(';', 1)[0]
+                children_ms[parent] = children_ms.get(parent, 0.0) + ms
+        for stack, ms in stack_ms.items():
+            totals[stack] = totals.get(stack, 0.0) + max(0.0, ms - children_ms.get(stack, 0.0))
+    return [f"{stack} {int(round(ms * 1000))}" for stack, ms in sorted(totals.items())]
@@ -0,0 +1,148 @@
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s')
+_ARRAY = re.compile(r'ARRAY\[[^\]]*\]', re.IGNORECASE)
+_ROW_OF_PARAMS = re.compile(r'\((?:\s*\?(?:::[\w ]+)?\s*,?)+\)')
+_REPEATED_ROWS = re.compile(r'\(\?\)(?:\s*,\s*\(\?\))+')
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_sql(query, max_length=500):
+    # Literals and parameters become '?', so one statement shape maps to one key
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', errors='replace')
+    elif not isinstance(query, str):
+        query = str(query)
+    text = _STRING_LITERAL.sub('?', query)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _ARRAY.sub('ARRAY[?]', text)
+    text = _ROW_OF_PARAMS.sub('(?)', text)
+    text = _REPEATED_ROWS.sub('(?), ...', text)
+    text = _WHITESPACE.sub(' ', text).strip()
+    return text[:max_length]
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, elapsed_ms):
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank, capped at the observed maximum
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total_ms,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': self.max_ms,
+            'buckets': {str(bound): bucket_count for bound, bucket_count in zip(LATENCY_BUCKETS_MS, self.counts)},
+        }
+
+class QueryStats:
+    # Latency histograms per normalized statement; the least recently seen statements are dropped past max_statements
+    def __init__(self, slow_query_ms=500.0, max_statements=500, slow_log_size=100):
+        self.slow_query_ms = slow_query_ms
+        self.max_statements = max_statements
+        self._statements = OrderedDict()  # sql -> {'latency', 'rows', 'errors'}
+        self._retries = {}
+        self._acquire = LatencyHistogram()
+        self._slow_queries = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self.dropped_statements = 0
+
+    def record(self, query, elapsed, rows=None, error=False):
+        sql = normalize_sql(query)
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            entry = self._statements.get(sql)
+            if entry is None:
+                entry = {'latency': LatencyHistogram(), 'rows': 0, 'errors': 0}
+                self._statements[sql] = entry
+                while len(self._statements) > self.max_statements:
+                    self._statements.popitem(last=False)
+                    self.dropped_statements += 1
+            self._statements.move_to_end(sql)
+            entry['latency'].add(elapsed_ms)
+            if rows is not None and rows >= 0:
+                entry['rows'] += rows
+            if error:
+                entry['errors'] += 1
+            slow = elapsed_ms >= self.slow_query_ms
+            if slow:
+                self._slow_queries.append({'at': time.time(), 'elapsed_ms': elapsed_ms, 'rows': rows, 'sql': sql})
+        if slow:
+            logging.warning(f"Slow query ({elapsed_ms:.1f} ms, {rows} rows): {sql}")
+
+    def record_retry(self, operation):
+        label = normalize_sql(operation) if isinstance(operation, (str, bytes)) else getattr(
+            operation, '__qualname__', repr(operation))
+        with self._lock:
+            self._retries[label] = self._retries.get(label, 0) + 1
+
+    def record_acquire(self, elapsed):
+        with self._lock:
+            self._acquire.add(elapsed * 1000)
+
+    def top_statements(self, limit=20, order_by='total_ms'):
+        with self._lock:
+            rows = [dict(entry['latency'].summary(), sql=sql, rows=entry['rows'], errors=entry['errors'])
+                    for sql, entry in self._statements.items()]
+        rows.sort(key=lambda row: row[order_by], reverse=True)
+        return rows[:limit]
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self._slow_queries))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'statements': len(self._statements),
+                'dropped_statements': self.dropped_statements,
+                'executions': sum(entry['latency'].count for entry in self._statements.values()),
+                'errors': sum(entry['errors'] for entry in self._statements.values()),
+                'retries': dict(self._retries),
+                'connection_acquire': self._acquire.summary(),
+                'slow_query_ms': self.slow_query_ms,
+                'slow_queries_logged': len(self._slow_queries),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._retries.clear()
+            self._acquire = LatencyHistogram()
+            self._slow_queries.clear()
+            self.dropped_statements = 0
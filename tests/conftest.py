@@ -0,0 +1,30 @@
+import uuid
+import pytest
+
+# Database tests run against DATABASE_URL (a .env file works too) and skip when it is unset.
+# Use a throwaway database: the schema is migrated and each test user is deleted afterwards.
+
+@pytest.fixture(scope='session')
+def db():
+    pytest.importorskip('psycopg2')
+    pytest.importorskip('dotenv')
+    import database
+    if not database.DATABASE_URL:
+        pytest.skip("DATABASE_URL is not set")
+    database.migrate()
+    yield database
+    database.close_pool()
+
+def delete_users(db, user_ids):
+    with db.transaction() as cur:
+        for table in ('monthly_category_totals', 'expenses', 'salary', 'categories'):
+            cur.execute(f"DELETE FROM {table} WHERE user_id = ANY(%s)", (list(user_ids),))
+        cur.execute("DELETE FROM users WHERE id = ANY(%s)", (list(user_ids),))
+
+@pytest.fixture
+def user_id(db):
+    rows = db.fetch_query("INSERT INTO users (username, password_hash) VALUES (%s, 'x') RETURNING id",
+                          (f"test-{uuid.uuid4().hex}",))
+    user_id = rows[0]['id']
+    yield user_id
+    delete_users(db, [user_id])
@@ -0,0 +1,13 @@
+def test_cleanup_only_removes_seeded_users(db, user_id):
+    import benchmark
+    db.execute_query("UPDATE users SET username = %s WHERE id = %s",
+                     (f"{benchmark.BENCHMARK_USER_PREFIX}real-{user_id}", user_id))
+    seeded = benchmark.seed_synthetic_data(users=2, years=1, expenses_per_month=5, custom_categories=1)
+    assert len(seeded) == 2
+
+    assert benchmark.remove_synthetic_data(list(seeded)) == 2
+    benchmark.seed_synthetic_data(users=1, years=1, expenses_per_month=5, custom_categories=1)
+    assert benchmark.remove_synthetic_data() == 1
+
+    remaining = db.fetch_query("SELECT id FROM users WHERE id = %s", (user_id,))
+    assert [row['id'] for row in remaining] == [user_id]
@@ -0,0 +1,32 @@
+import os
+import pytest
+import currency
+
+@pytest.fixture
+def rates_file(tmp_path, monkeypatch):
+    path = tmp_path / 'fx_rates.csv'
+    monkeypatch.setattr(currency, 'FX_RATES_FILE', str(path))
+    monkeypatch.setattr(currency, '_rates', {currency.BASE_CURRENCY: 1.0})
+    monkeypatch.setattr(currency, '_rates_version', None)
+    monkeypatch.setattr(currency, '_rates_loaded', False)
+    return path
+
+def write_rates(path, text, mtime_ns):
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_malformed_rates_file_keeps_the_last_good_table(rates_file):
+    write_rates(rates_file, "currency,per_usd\nUSD,1\nEUR,0.5\n", 1_000_000_000)
+    assert currency.convert_amount(10, 'EUR', 'USD') == 20.0
+
+    write_rates(rates_file, "currency,per_usd\nEUR,not-a-rate\n", 2_000_000_000)
+    assert currency.get_fx_rates() == {'USD': 1.0, 'EUR': 0.5}
+    assert currency.convert_amount(10, 'EUR', 'USD') == 20.0
+
+    write_rates(rates_file, "currency,per_usd\nUSD,1\nEUR,0.25\n", 3_000_000_000)
+    assert currency.convert_amount(10, 'EUR', 'USD') == 40.0
+
+def test_malformed_rates_file_raises_when_nothing_was_loaded(rates_file):
+    write_rates(rates_file, "currency,per_usd\nEUR,not-a-rate\n", 1_000_000_000)
+    with pytest.raises(ValueError):
+        currency.get_fx_rates()
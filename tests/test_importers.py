@@ -0,0 +1,43 @@
+import io
+import pytest
+from importers import parse_ofx, parse_amount, ImportRowError, ImportRowSkipped
+
+STATEMENT = b"""OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>EUR
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240105<TRNAMT>-12.50<NAME>Cafe</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240106<TRNAMT>1500.00<NAME>Salary</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240107<TRNAMT>-40.00<NAME>Market</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+def test_parse_ofx_yields_credits_as_skipped_not_errors():
+    rows = [row for _, row in parse_ofx(io.BytesIO(STATEMENT))]
+    assert isinstance(rows[1], ImportRowSkipped)
+    assert not isinstance(rows[1], ImportRowError)
+    assert [row['amount'] for row in (rows[0], rows[2])] == [12.5, 40.0]
+    assert {row['currency'] for row in (rows[0], rows[2])} == {'EUR'}
+
+@pytest.mark.parametrize('value, decimal, expected', [
+    ('1,234', '.', 1234.0),
+    ('1,234', ',', 1.234),
+    ('1.234,56', ',', 1234.56),
+    ('$1,234.56', '.', 1234.56),
+])
+def test_parse_amount(value, decimal, expected):
+    assert parse_amount(value, decimal) == expected
+
+def test_parse_amount_rejects_values_outside_the_chosen_style():
+    with pytest.raises(ImportRowError):
+        parse_amount('12,5', '.')
+
+def test_strict_ofx_import_skips_credits(db, user_id):
+    pytest.importorskip('pandas')
+    from expense_tracker import ExpenseTracker
+    tracker = ExpenseTracker(user_id)
+    report = tracker.import_expenses(io.BytesIO(STATEMENT), file_format='ofx',
+                                     default_category=db.DEFAULT_CATEGORIES[0], strict=True)
+    assert report['rolled_back'] is False
+    assert (report['imported'], report['skipped'], report['error_count']) == (2, 1, 0)
+    rows = db.fetch_query("SELECT amount, currency FROM expenses WHERE user_id = %s ORDER BY amount", (user_id,))
+    assert [(row['amount'], row['currency']) for row in rows] == [(12.5, 'EUR'), (40.0, 'EUR')]
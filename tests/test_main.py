@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+import pytest
+
+execute_values = pytest.importorskip('psycopg2.extras').execute_values
+
+def test_expense_list_pages_forward_and_back(db, user_id, monkeypatch):
+    pytest.importorskip('pandas')
+    pytest.importorskip('streamlit')
+    from streamlit.testing.v1 import AppTest
+    import main
+    import auth
+    monkeypatch.setattr(auth, 'JWT_SECRET', auth.JWT_SECRET or 'test-secret')
+
+    today = datetime.now()
+    category_id = db.fetch_query("SELECT id FROM categories WHERE user_id IS NULL LIMIT 1")[0]['id']
+    page_size = main.EXPENSES_PAGE_SIZE
+    with db.transaction() as cur:
+        execute_values(cur, "INSERT INTO expenses (user_id, category_id, amount, date) VALUES %s", [
+            (user_id, category_id, number + 1, today.replace(day=1, hour=0) + timedelta(minutes=number))
+            for number in range(page_size + 5)
+        ])
+
+    app = AppTest.from_file('main.py', default_timeout=30)
+    app.session_state['token'] = auth.create_token(user_id)
+    app.session_state['user'] = 'test'
+    app.session_state['user_id'] = user_id
+    app.run()
+    assert not app.exception
+    assert 'Page 1' in [caption.value for caption in app.caption]
+
+    app.button(key='expenses_next_page').click().run()
+    assert not app.exception
+    assert 'Page 2' in [caption.value for caption in app.caption]
+    assert len(app.session_state['expense_page_cursors']) == 2
+
+    app.button(key='expenses_previous_page').click().run()
+    assert not app.exception
+    assert 'Page 1' in [caption.value for caption in app.caption]
+    assert len(app.session_state['expense_page_cursors']) == 1
@@ -0,0 +1,34 @@
+import random
+from datetime import date
+import pytest
+
+execute_values = pytest.importorskip('psycopg2.extras').execute_values
+
+def rollup(db, user_id):
+    rows = db.fetch_query(
+        "SELECT year, month, category_id, currency, total, expense_count FROM monthly_category_totals "
+        "WHERE user_id = %s",
+        (user_id,))
+    return {(row['year'], row['month'], row['category_id'], row['currency']): (row['total'], row['expense_count'])
+            for row in rows}
+
+def test_rebuilt_rollup_matches_trigger_maintained_totals(db, user_id):
+    rng = random.Random(4)
+    category_ids = [row['id'] for row in db.fetch_query("SELECT id FROM categories WHERE user_id IS NULL")]
+    expenses = [
+        (user_id, rng.choice(category_ids), round(rng.uniform(0.01, 500), 2),
+         date(2024, rng.randint(1, 12), rng.randint(1, 28)), rng.choice(['USD', 'EUR']))
+        for _ in range(5000)
+    ]
+    with db.transaction() as cur:
+        execute_values(cur, "INSERT INTO expenses (user_id, category_id, amount, date, currency) VALUES %s",
+                       expenses)
+
+    maintained = rollup(db, user_id)
+    db.rebuild_monthly_totals(user_id)
+    rebuilt = rollup(db, user_id)
+
+    assert rebuilt.keys() == maintained.keys()
+    for key, (total, count) in maintained.items():
+        assert rebuilt[key][1] == count
+        assert rebuilt[key][0] == pytest.approx(total, abs=1e-6)
@@ -1,5 +1,16 @@
+import hashlib
+import functools
+import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
+from config import env
+from cache import TTLCache, MISSING
+
+FIGURE_CACHE_MAX_ENTRIES = env('FIGURE_CACHE_MAX_ENTRIES', 128, int)
+FIGURE_CACHE_TTL = env('FIGURE_CACHE_TTL', 600.0, float)
+
+# Keys are content fingerprints, so entries never go stale; the TTL only releases memory
+figure_cache = TTLCache(maxsize=FIGURE_CACHE_MAX_ENTRIES, ttl=FIGURE_CACHE_TTL)
 
 translations = {
     'English': {
@@ -24,8 +35,29 @@ translations = {
     }
 }
 
+def frame_fingerprint(frame):
+    row_hashes = pd.util.hash_pandas_object(frame, index=True).values
+    digest = hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+    return (tuple(frame.columns), tuple(str(dtype) for dtype in frame.dtypes), digest)
+
+def cached_figure(func):
+    # Figures are shared between reruns and sessions; callers must not modify them
+    @functools.wraps(func)
+    def wrapper(frame, currency_symbol='$', lang='English'):
+        key = (func.__name__, frame_fingerprint(frame), currency_symbol, lang)
+        fig = figure_cache.get(key)
+        if fig is MISSING:
+            fig = func(frame, currency_symbol, lang)
+            figure_cache.set(key, fig)
+        return fig
+    return wrapper
+
+def get_figure_cache_stats():
+    return figure_cache.stats()
+
+@cached_figure
 def create_expense_pie_chart(expenses_df, currency_symbol='$', lang='English'):
-    grouped_expenses = expenses_df.groupby('category')['amount'].sum().reset_index()
+    grouped_expenses = expenses_df.groupby('category', observed=True)['amount'].sum().reset_index()
     
     fig = go.Figure(data=[go.Pie(
         labels=grouped_expenses['category'],
@@ -45,6 +77,7 @@ def create_expense_pie_chart(expenses_df, currency_symbol='$', lang='English'):
     
     return fig
 
+@cached_figure
 def create_expense_comparison_chart(comparison_df, currency_symbol='$', lang='English'):
     fig = px.bar(comparison_df, x='month', y='total_expenses', color='year', barmode='group',
                  labels={'total_expenses': f"{translations[lang]['Total Expenses']} ({currency_symbol})", 'month': translations[lang]['Month'], 'year': translations[lang]['Year']},
@@ -60,6 +93,7 @@ def create_expense_comparison_chart(comparison_df, currency_symbol='$', lang='En
     
     return fig
 
+@cached_figure
 def create_category_comparison_chart(comparison_df, currency_symbol='$', lang='English'):
     fig = px.bar(comparison_df, x='month', y='amount', color='category', barmode='stack',
                  facet_col='year', facet_col_wrap=2,